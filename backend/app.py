@@ -1,15 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
 import secrets
+import threading
 import time
 from datetime import datetime, timedelta, timezone
+from functools import partial
 from pathlib import Path
 from urllib.parse import urlencode
 
 from dotenv import load_dotenv
-from flask import Flask, g, jsonify, redirect, request, send_from_directory, session
+from flask import (
+    Flask,
+    Response,
+    g,
+    jsonify,
+    redirect,
+    request,
+    send_from_directory,
+    session,
+)
 from flask_session import Session
 from cachelib.file import FileSystemCache
 
@@ -20,30 +33,81 @@ except ImportError:  # pragma: no cover - optional in tests/runtime
 
 from blend_service import (
     BlendValidationError,
+    add_to_track_table,
     build_contribution_snapshot,
     build_generated_cover_art,
-    build_room_blend_preview,
+    build_indexed_blend_preview,
+    build_track_table,
+    compact_track_table,
     build_wrapped_artifact,
+    normalize_track_snapshot,
+    remove_from_track_table,
     round_to_two,
 )
+from codec import ROOM_COMPRESSION_THRESHOLD, FastJSONProvider, dumps
 from debug_tools import DebugRecorder, configure_app_logger
 from e2e_support import E2EFakeSpotifyFactory
-from room_store import RoomStore, utc_now_iso
+from fetch_pool import (
+    DEFAULT_FETCH_CONCURRENCY,
+    DEFAULT_WARMUP_WORKERS,
+    BackgroundWarmer,
+    SourceFetcher,
+    run_source,
+)
+from room_events import (
+    ROOM_EVENT_KEEPALIVE_SECONDS,
+    ROOM_EVENT_MAX_STREAMS,
+    ROOM_EVENT_POLL_SECONDS,
+    RedisRoomEventBroker,
+    RoomEventBroker,
+    diff_serialized_room,
+    format_sse,
+)
+from room_store import (
+    ROOM_SWEEP_INTERVAL_SECONDS,
+    RoomConflictError,
+    RoomDataLostError,
+    RoomStore,
+    start_room_sweeper,
+    utc_now_iso,
+)
 from mood_history import get_mood_summary
 from mood_service import get_mood_tracks, load_mood_profiles, VALID_MOODS
-from spotify_client import SpotifyAPIError, SpotifyClient
+from rate_limiter import DEFAULT_BURST, DEFAULT_RATE_PER_SECOND, RequestScheduler
+from sqlite_room_store import SqliteRoomStore
+from spotify_client import (
+    DEFAULT_HTTP_CONNECT_RETRIES,
+    DEFAULT_HTTP_POOL_SIZE,
+    ETagStoreRegistry,
+    SpotifyAPIError,
+    SpotifyClient,
+    build_http_session,
+)
+from track_cache import (
+    PLAYLIST_TRACK_CACHE_MAX_ENTRIES,
+    PLAYLIST_TRACK_CACHE_SECONDS,
+    SOURCE_CATALOG_CACHE_MAX_ENTRIES,
+    SOURCE_CATALOG_CACHE_SECONDS,
+    SOURCE_RESULT_CACHE_MAX_ENTRIES,
+    SOURCE_RESULT_MAX_AGE_SECONDS,
+    PlaylistTrackCache,
+    SourceCatalogCache,
+    SourceResultCache,
+)
 
 
 load_dotenv()
 
 MAX_ROOM_MEMBERS = 6
+ROOM_UPDATE_ATTEMPTS = 5
 MAX_PLAYLISTS_PER_MEMBER = 5
 TOP_TRACK_CAP = 50
 SAVED_TRACK_CAP = 500
 RECENT_TRACK_CAP = 50
 PLAYLIST_TRACK_CAP = 500
+BLEND_PREVIEW_LIMIT = 50
 ROOM_TTL_SECONDS = 7 * 24 * 60 * 60
-SOURCE_CATALOG_CACHE_SECONDS = 5 * 60
+PROFILE_CACHE_SECONDS = 5 * 60
 
 
 class ApiError(Exception):
@@ -64,6 +128,8 @@ def env_flag(name, default=False):
 
 def build_config():
     root_dir = Path(__file__).resolve().parents[1]
+    # Room and source stores live in the Flask instance folder, outside the source tree.
+    instance_dir = Path(os.getenv("SATO_INSTANCE_DIR") or Path(__file__).resolve().parent / "instance")
     frontend_dist = root_dir / "sato-app" / "dist"
     client_app_url = os.getenv("CLIENT_APP_URL", "http://127.0.0.1:5173")
     redirect_uri = os.getenv(
@@ -90,17 +156,114 @@ def build_config():
         "SPOTIFY_REDIRECT_URI": redirect_uri,
         "FRONTEND_DIST_DIR": frontend_dist,
         "ROOM_TTL_SECONDS": ROOM_TTL_SECONDS,
+        "ROOM_STORE_BACKEND": os.getenv("SATO_ROOM_STORE_BACKEND", "cache"),
+        "ROOM_SQLITE_PATH": os.getenv(
+            "SATO_ROOM_SQLITE_PATH",
+            str(instance_dir / "rooms.sqlite3"),
+        ),
+        "ROOM_EVENT_KEEPALIVE_SECONDS": int(
+            os.getenv("SATO_ROOM_EVENT_KEEPALIVE_SECONDS", str(ROOM_EVENT_KEEPALIVE_SECONDS))
+        ),
+        "ROOM_EVENT_MAX_STREAMS": int(
+            os.getenv("SATO_ROOM_EVENT_MAX_STREAMS", str(ROOM_EVENT_MAX_STREAMS))
+        ),
+        "ROOM_EVENT_POLL_SECONDS": float(
+            os.getenv("SATO_ROOM_EVENT_POLL_SECONDS", str(ROOM_EVENT_POLL_SECONDS))
+        ),
+        "ROOM_SWEEP_INTERVAL_SECONDS": int(
+            os.getenv("SATO_ROOM_SWEEP_INTERVAL_SECONDS", str(ROOM_SWEEP_INTERVAL_SECONDS))
+        ),
+        "ROOM_COMPRESSION": os.getenv("SATO_ROOM_COMPRESSION") or None,
+        "ROOM_COMPRESSION_THRESHOLD": int(
+            os.getenv("SATO_ROOM_COMPRESSION_THRESHOLD", str(ROOM_COMPRESSION_THRESHOLD))
+        ),
         "SOURCE_CATALOG_CACHE_SECONDS": SOURCE_CATALOG_CACHE_SECONDS,
+        "SOURCE_RESULT_MAX_AGE_SECONDS": int(
+            os.getenv("SATO_SOURCE_RESULT_MAX_AGE_SECONDS", str(SOURCE_RESULT_MAX_AGE_SECONDS))
+        ),
+        "SOURCE_CATALOG_WARMUP": env_flag("SATO_SOURCE_CATALOG_WARMUP", True),
+        "SOURCE_CATALOG_WARMUP_WORKERS": int(
+            os.getenv("SATO_SOURCE_CATALOG_WARMUP_WORKERS", str(DEFAULT_WARMUP_WORKERS))
+        ),
+        "SOURCE_CATALOG_CACHE_MAX_ENTRIES": int(
+            os.getenv(
+                "SATO_SOURCE_CATALOG_CACHE_MAX_ENTRIES",
+                str(SOURCE_CATALOG_CACHE_MAX_ENTRIES),
+            )
+        ),
+        "BLEND_ENGINE": os.getenv("SATO_BLEND_ENGINE", "python"),
+        "PROFILE_CACHE_SECONDS": int(
+            os.getenv("SATO_PROFILE_CACHE_SECONDS", str(PROFILE_CACHE_SECONDS))
+        ),
         "E2E_MODE": env_flag("SATO_E2E"),
         "DEBUG_LOGGING_ENABLED": env_flag("SATO_DEBUG_LOGGING", env_flag("SATO_E2E")),
         "DEBUG_LOG_FILE": os.getenv("SATO_DEBUG_LOG_PATH"),
         "DEBUG_LOG_BUFFER_SIZE": int(os.getenv("SATO_DEBUG_LOG_BUFFER_SIZE", "500")),
+        "SPOTIFY_FETCH_CONCURRENCY": int(
+            os.getenv("SATO_SPOTIFY_FETCH_CONCURRENCY", str(DEFAULT_FETCH_CONCURRENCY))
+        ),
+        "SPOTIFY_PAGE_FANOUT": int(os.getenv("SATO_SPOTIFY_PAGE_FANOUT", "1")),
+        "SPOTIFY_RATE_LIMIT_PER_SECOND": float(
+            os.getenv("SATO_SPOTIFY_RATE_LIMIT_PER_SECOND", str(DEFAULT_RATE_PER_SECOND))
+        ),
+        "SPOTIFY_RATE_LIMIT_BURST": int(
+            os.getenv("SATO_SPOTIFY_RATE_LIMIT_BURST", str(DEFAULT_BURST))
+        ),
+        "SPOTIFY_HTTP_POOL_SIZE": int(
+            os.getenv("SATO_SPOTIFY_HTTP_POOL_SIZE", str(DEFAULT_HTTP_POOL_SIZE))
+        ),
+        "SPOTIFY_HTTP_CONNECT_RETRIES": int(
+            os.getenv("SATO_SPOTIFY_HTTP_CONNECT_RETRIES", str(DEFAULT_HTTP_CONNECT_RETRIES))
+        ),
+        "SPOTIFY_ETAG_CACHE_USERS": int(os.getenv("SATO_SPOTIFY_ETAG_CACHE_USERS", "256")),
+        "SPOTIFY_ETAG_CACHE_ENTRIES": int(os.getenv("SATO_SPOTIFY_ETAG_CACHE_ENTRIES", "32")),
+        "PLAYLIST_TRACK_CACHE_SECONDS": int(
+            os.getenv("SATO_PLAYLIST_TRACK_CACHE_SECONDS", str(PLAYLIST_TRACK_CACHE_SECONDS))
+        ),
+        "PLAYLIST_TRACK_CACHE_MAX_ENTRIES": int(
+            os.getenv(
+                "SATO_PLAYLIST_TRACK_CACHE_MAX_ENTRIES",
+                str(PLAYLIST_TRACK_CACHE_MAX_ENTRIES),
+            )
+        ),
     }
 
     session_dir = root_dir / ".flask_session"
     session_dir.mkdir(parents=True, exist_ok=True)
     config["SESSION_CACHELIB"] = FileSystemCache(str(session_dir), threshold=500)
 
+    # Rooms get their own directory so they never compete with sessions. It is
+    # never pruned: cachelib would delete the oldest files of live rooms, so
+    # only the room sweeper removes rooms, once they have expired.
+    room_dir = instance_dir / "rooms"
+    room_dir.mkdir(parents=True, exist_ok=True)
+    config["ROOM_CACHELIB"] = FileSystemCache(str(room_dir), threshold=0)
+    # Workers sharing the room directory serialize their writes on these lock files.
+    config["ROOM_LOCK_DIR"] = str(instance_dir / "room-locks")
+
+    # Playlist tracks, catalogs and source results live on disk so every worker
+    # on the host shares them.
+    playlist_dir = instance_dir / "playlist-tracks"
+    playlist_dir.mkdir(parents=True, exist_ok=True)
+    config["PLAYLIST_TRACK_CACHELIB"] = FileSystemCache(
+        str(playlist_dir),
+        threshold=config["PLAYLIST_TRACK_CACHE_MAX_ENTRIES"],
+    )
+
+    catalog_dir = instance_dir / "source-catalogs"
+    catalog_dir.mkdir(parents=True, exist_ok=True)
+    config["SOURCE_CATALOG_CACHELIB"] = FileSystemCache(
+        str(catalog_dir),
+        threshold=config["SOURCE_CATALOG_CACHE_MAX_ENTRIES"],
+    )
+
+    result_dir = instance_dir / "source-results"
+    result_dir.mkdir(parents=True, exist_ok=True)
+    config["SOURCE_RESULT_CACHELIB"] = FileSystemCache(
+        str(result_dir),
+        threshold=SOURCE_RESULT_CACHE_MAX_ENTRIES,
+    )
+
     redis_url = os.getenv("REDIS_URL")
     if redis_url and Redis is not None:
         config["SESSION_TYPE"] = "redis"
@@ -111,6 +274,7 @@ def build_config():
 
 def create_app(test_config=None):
     app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
     app.config.from_mapping(build_config())
     if test_config:
         app.config.update(test_config)
@@ -124,6 +288,22 @@ def create_app(test_config=None):
             lambda **kwargs: SpotifyClient(**kwargs),
         )
 
+    app.config.setdefault(
+        "SPOTIFY_REQUEST_SCHEDULER",
+        RequestScheduler(
+            rate_per_second=app.config["SPOTIFY_RATE_LIMIT_PER_SECOND"],
+            burst=app.config["SPOTIFY_RATE_LIMIT_BURST"],
+        ),
+    )
+
+    app.config.setdefault(
+        "SPOTIFY_HTTP_SESSION",
+        build_http_session(
+            pool_size=app.config["SPOTIFY_HTTP_POOL_SIZE"],
+            connect_retries=app.config["SPOTIFY_HTTP_CONNECT_RETRIES"],
+        ),
+    )
+
     app.config["DEBUG_RECORDER"] = DebugRecorder(
         max_events=app.config["DEBUG_LOG_BUFFER_SIZE"],
         log_path=app.config.get("DEBUG_LOG_FILE"),
@@ -205,8 +385,22 @@ def register_error_handlers(app):
         }
         return jsonify(payload), 400
 
+    @app.errorhandler(RoomDataLostError)
+    def handle_room_data_lost(error):
+        app.logger.error("Room %s is missing its track data.", error)
+        payload = {
+            "error": {
+                "code": "room_data_lost",
+                "message": "This room's tracks are no longer available. Start a new room.",
+                "details": {},
+            }
+        }
+        return jsonify(payload), 410
+
     @app.errorhandler(SpotifyAPIError)
     def handle_spotify_error(error):
+        if error.status_code == 401:
+            session.pop("spotify_user_fetched_at", None)
         logging.getLogger("sato.spotify").warning(
             "Spotify request failed",
             extra={
@@ -241,11 +435,64 @@ def register_error_handlers(app):
 
 
 def register_routes(app):
-    room_store = RoomStore(
-        cachelib=app.config.get("SESSION_CACHELIB"),
+    room_events = (
+        RedisRoomEventBroker(app.config["SESSION_REDIS"])
+        if app.config.get("SESSION_REDIS") is not None
+        else RoomEventBroker()
+    )
+    app.extensions["sato_room_events"] = room_events
+    # Each open stream holds a server thread (or greenlet) for as long as the
+    # tab stays open. Past the cap, clients fall back to polling so streams
+    # cannot starve ordinary requests.
+    room_event_slots = threading.BoundedSemaphore(app.config["ROOM_EVENT_MAX_STREAMS"])
+    room_store_options = {
+        "events": room_events,
+        "ttl_seconds": app.config["ROOM_TTL_SECONDS"],
+        "compression": app.config["ROOM_COMPRESSION"],
+        "compression_threshold": app.config["ROOM_COMPRESSION_THRESHOLD"],
+    }
+    if app.config["ROOM_STORE_BACKEND"] == "sqlite":
+        room_store = SqliteRoomStore(app.config["ROOM_SQLITE_PATH"], **room_store_options)
+    else:
+        room_store = RoomStore(
+            cachelib=app.config.get("ROOM_CACHELIB") or app.config.get("SESSION_CACHELIB"),
+            redis_client=app.config.get("SESSION_REDIS"),
+            lock_dir=app.config.get("ROOM_LOCK_DIR"),
+            **room_store_options,
+        )
+    app.extensions["sato_room_sweeper"] = start_room_sweeper(
+        room_store,
+        interval_seconds=app.config["ROOM_SWEEP_INTERVAL_SECONDS"],
+    )
+    source_fetcher = SourceFetcher(max_workers=app.config["SPOTIFY_FETCH_CONCURRENCY"])
+    profile_cache_stats = {"hits": 0, "misses": 0}
+    etag_stores = ETagStoreRegistry(
+        max_users=app.config["SPOTIFY_ETAG_CACHE_USERS"],
+        max_entries_per_user=app.config["SPOTIFY_ETAG_CACHE_ENTRIES"],
+    )
+    playlist_track_cache = PlaylistTrackCache(
+        cachelib=app.config.get("PLAYLIST_TRACK_CACHELIB"),
         redis_client=app.config.get("SESSION_REDIS"),
-        ttl_seconds=app.config["ROOM_TTL_SECONDS"],
+        ttl_seconds=app.config["PLAYLIST_TRACK_CACHE_SECONDS"],
+        max_entries=app.config["PLAYLIST_TRACK_CACHE_MAX_ENTRIES"],
     )
+    source_catalog_cache = SourceCatalogCache(
+        cachelib=app.config.get("SOURCE_CATALOG_CACHELIB"),
+        redis_client=app.config.get("SESSION_REDIS"),
+        ttl_seconds=app.config["SOURCE_CATALOG_CACHE_SECONDS"],
+        max_entries=app.config["SOURCE_CATALOG_CACHE_MAX_ENTRIES"],
+    )
+    source_result_cache = SourceResultCache(
+        cachelib=app.config.get("SOURCE_RESULT_CACHELIB"),
+        redis_client=app.config.get("SESSION_REDIS"),
+        ttl_seconds=app.config["SOURCE_RESULT_MAX_AGE_SECONDS"],
+    )
+    catalog_warmer = (
+        BackgroundWarmer(max_workers=app.config["SOURCE_CATALOG_WARMUP_WORKERS"])
+        if app.config["SOURCE_CATALOG_WARMUP"]
+        else None
+    )
+    app.extensions["sato_catalog_warmer"] = catalog_warmer
 
     def debug_event(kind, **details):
         writer = app.config.get("DEBUG_EVENT_WRITER")
@@ -299,9 +546,11 @@ def register_routes(app):
         )
 
     def clear_spotify_auth_state():
+        source_catalog_cache.delete((session.get("spotify_user") or {}).get("id"))
         session.pop("oauth_state", None)
         session.pop("spotify_tokens", None)
         session.pop("spotify_user", None)
+        session.pop("spotify_user_fetched_at", None)
         session.pop("source_catalog_cache", None)
         session.modified = True
 
@@ -313,6 +562,7 @@ def register_routes(app):
         refresh_token=None,
         expires_at=None,
         token_updater=None,
+        etag_store=None,
     ):
         if client_id is None or client_secret is None:
             credentials = require_spotify_credentials()
@@ -328,6 +578,10 @@ def register_routes(app):
             refresh_token=refresh_token,
             expires_at=expires_at,
             token_updater=token_updater,
+            http_session=app.config["SPOTIFY_HTTP_SESSION"],
+            page_fanout=app.config["SPOTIFY_PAGE_FANOUT"],
+            scheduler=app.config["SPOTIFY_REQUEST_SCHEDULER"],
+            etag_store=etag_store,
         )
 
     def validate_spotify_credentials(client):
@@ -356,11 +610,13 @@ def register_routes(app):
 
     def get_spotify_client():
         tokens = session.get("spotify_tokens") or {}
+        user_id = (session.get("spotify_user") or {}).get("id")
         return build_spotify_client(
             access_token=tokens.get("access_token"),
             refresh_token=tokens.get("refresh_token"),
             expires_at=tokens.get("expires_at"),
             token_updater=store_spotify_tokens,
+            etag_store=etag_stores.for_user(user_id) if user_id else None,
         )
 
     def require_spotify_session():
@@ -383,8 +639,20 @@ def register_routes(app):
             )
         return payload
 
+    def store_spotify_user(spotify_user):
+        session["spotify_user"] = spotify_user
+        session["spotify_user_fetched_at"] = time.time()
+        session.modified = True
+        return spotify_user
+
     def fetch_or_get_cached_user(client):
         spotify_user = session.get("spotify_user")
+        fetched_at = float(session.get("spotify_user_fetched_at") or 0)
+        if spotify_user and (time.time() - fetched_at) <= app.config["PROFILE_CACHE_SECONDS"]:
+            profile_cache_stats["hits"] += 1
+            return spotify_user
+
+        profile_cache_stats["misses"] += 1
         if spotify_user:
             try:
                 spotify_user = client.get_current_user()
@@ -392,12 +660,9 @@ def register_routes(app):
                 if error.status_code != 401:
                     raise
             else:
-                session["spotify_user"] = spotify_user
-                return spotify_user
+                return store_spotify_user(spotify_user)
 
-        spotify_user = client.get_current_user()
-        session["spotify_user"] = spotify_user
-        return spotify_user
+        return store_spotify_user(client.get_current_user())
 
     def utc_future_iso(seconds):
         return (
@@ -438,8 +703,8 @@ def register_routes(app):
                 return member
         return None
 
-    def require_room(token):
-        room = room_store.get_room(token)
+    def require_room(token, *, include_tracks=False):
+        room = room_store.get_room(token, include_tracks=include_tracks)
         if room:
             return room
         raise ApiError(
@@ -448,6 +713,19 @@ def register_routes(app):
             code="room_not_found",
         )
 
+    def update_room(token, mutation, *, include_tracks=False):
+        for _ in range(ROOM_UPDATE_ATTEMPTS):
+            room = require_room(token, include_tracks=include_tracks)
+            try:
+                return mutation(room)
+            except RoomConflictError:
+                continue
+        raise ApiError(
+            "This room changed while saving. Try again.",
+            status_code=409,
+            code="room_conflict",
+        )
+
     def require_room_member(room, user_id):
         member = find_room_member(room, user_id)
         if member:
@@ -500,43 +778,50 @@ def register_routes(app):
             "collaborative": bool(playlist.get("collaborative")),
             "owner_id": owner.get("id") or "",
             "owner_name": owner.get("display_name") or owner.get("id") or "",
+            "snapshot_id": playlist.get("snapshot_id"),
         }
 
     def get_cached_source_catalog(user_id):
-        cache_bucket = session.get("source_catalog_cache") or {}
-        cache_entry = cache_bucket.get(str(user_id))
-        if not cache_entry:
-            return None
-
-        cached_at = float(cache_entry.get("cached_at", 0))
-        if (time.time() - cached_at) > app.config["SOURCE_CATALOG_CACHE_SECONDS"]:
-            cache_bucket.pop(str(user_id), None)
-            session["source_catalog_cache"] = cache_bucket
+        # Sessions written before catalogs moved server-side still carry a copy.
+        if session.pop("source_catalog_cache", None) is not None:
             session.modified = True
-            return None
-
-        return cache_entry.get("payload")
+        return source_catalog_cache.get(str(user_id))
 
     def store_source_catalog(user_id, payload):
-        cache_bucket = session.get("source_catalog_cache") or {}
-        cache_bucket[str(user_id)] = {
-            "cached_at": time.time(),
-            "payload": payload,
-        }
-        session["source_catalog_cache"] = cache_bucket
-        session.modified = True
-        return payload
+        return source_catalog_cache.set(str(user_id), payload)
 
-    def build_source_catalog(client, current_user, *, force_refresh=False):
+    async def build_source_catalog(client, current_user, *, force_refresh=False):
+        user_id = str(current_user["id"])
         if not force_refresh:
-            cached_payload = get_cached_source_catalog(current_user["id"])
+            cached_payload = get_cached_source_catalog(user_id)
             if cached_payload is not None:
                 return cached_payload
 
-        top_tracks = client.get_current_user_top_tracks(limit=TOP_TRACK_CAP)
-        saved_tracks_count = client.get_saved_tracks_total(limit_cap=SAVED_TRACK_CAP)
-        recent_tracks = client.get_recently_played(limit=RECENT_TRACK_CAP)
-        playlist_items = client.get_current_user_playlists(limit=200)
+            # Warm-ups are tracked per process, so only the worker that handled
+            # the login callback can join one; other workers load the catalog.
+            warmup = catalog_warmer.pending(user_id) if catalog_warmer is not None else None
+            if warmup is not None:
+                try:
+                    return await asyncio.wrap_future(warmup)
+                except SpotifyAPIError as error:
+                    app.logger.info(
+                        "Source catalog warm-up for %s failed (%s); loading it now.",
+                        user_id,
+                        error.status_code,
+                    )
+
+        return store_source_catalog(user_id, await load_source_catalog(client, user_id))
+
+    async def load_source_catalog(client, user_id):
+        top_tracks, saved_tracks_count, recent_tracks, playlist_items = await source_fetcher.run_async(
+            [
+                partial(client.get_current_user_top_tracks, limit=TOP_TRACK_CAP),
+                partial(client.get_saved_tracks_total, limit_cap=SAVED_TRACK_CAP),
+                partial(client.get_recently_played, limit=RECENT_TRACK_CAP),
+                partial(client.get_current_user_playlists, limit=200),
+            ],
+            user_id=user_id,
+        )
 
         allowed_playlists = []
         seen_playlist_ids = set()
@@ -545,7 +830,7 @@ def register_routes(app):
             if (
                 not playlist_id
                 or playlist_id in seen_playlist_ids
-                or not owned_or_collaborative_playlist(playlist, current_user["id"])
+                or not owned_or_collaborative_playlist(playlist, user_id)
             ):
                 continue
 
@@ -575,7 +860,56 @@ def register_routes(app):
                 "per_playlist_track_cap": PLAYLIST_TRACK_CAP,
             },
         }
-        return store_source_catalog(current_user["id"], payload)
+        return payload
+
+    def warm_source_catalog(client, user_id):
+        # Runs on a warm-up thread with no request context, so it must not touch
+        # the session; the client it gets has no token updater for that reason.
+        try:
+            return store_source_catalog(user_id, asyncio.run(load_source_catalog(client, user_id)))
+        except Exception:
+            app.logger.warning("Source catalog warm-up failed for %s.", user_id, exc_info=True)
+            raise
+
+    def start_source_catalog_warmup(token_payload, user_id):
+        user_id = str(user_id)
+        if catalog_warmer is None or source_catalog_cache.get(user_id) is not None:
+            return
+        client = build_spotify_client(
+            access_token=token_payload.get("access_token"),
+            refresh_token=token_payload.get("refresh_token"),
+            expires_at=token_payload.get("expires_at"),
+            etag_store=etag_stores.for_user(user_id),
+        )
+        catalog_warmer.submit(user_id, partial(warm_source_catalog, client, user_id))
+
+    async def fetch_playlist_tracks(client, playlist_id, snapshot_id=None):
+        # The catalog already lists each playlist's snapshot_id, so an unchanged
+        # playlist costs no request at all.
+        if not snapshot_id:
+            snapshot_id = await run_source(partial(client.get_playlist_snapshot_id, playlist_id))
+        cached_tracks = playlist_track_cache.get(playlist_id, snapshot_id, PLAYLIST_TRACK_CAP)
+        if cached_tracks is not None:
+            return cached_tracks
+
+        tracks = normalize_track_snapshot(
+            await run_source(partial(client.get_playlist_tracks, playlist_id, limit=PLAYLIST_TRACK_CAP))
+        )
+        return playlist_track_cache.set(playlist_id, snapshot_id, PLAYLIST_TRACK_CAP, tracks)
+
+    async def fetch_source_tracks(user_id, source_key, task):
+        tracks = source_result_cache.get(user_id, source_key)
+        if tracks is None:
+            tracks = source_result_cache.set(
+                user_id,
+                source_key,
+                normalize_track_snapshot(await run_source(task)),
+            )
+        return tracks
+
+    async def fetch_contribution_sources(user_id, tasks):
+        results = await source_fetcher.run_async([task for _, task in tasks], user_id=user_id)
+        return dict(zip((name for name, _ in tasks), results))
 
     def contributing_member_ids(room):
         return [
@@ -673,7 +1007,7 @@ def register_routes(app):
                     "id": member["id"],
                     "name": member.get("display_name") or member["id"],
                     "weight": weight,
-                    "tracks": contribution["tracks"],
+                    "track_count": contribution["track_count"],
                 }
             )
 
@@ -695,6 +1029,81 @@ def register_routes(app):
 
         return contributors
 
+    def room_track_table(room):
+        if "track_table" not in room:
+            room.pop("score_index", None)
+            room["track_table"] = build_track_table(room["contributions"])
+        return room["track_table"]
+
+    def replace_room_contribution(room, member_id, contribution):
+        migrated = "track_table" not in room
+        track_table = room_track_table(room)
+        previous = room["contributions"].pop(member_id, None)
+        if previous:
+            remove_from_track_table(track_table, member_id, previous["track_refs"])
+        if contribution is not None:
+            contribution["track_refs"] = add_to_track_table(
+                track_table,
+                member_id,
+                contribution.pop("tracks"),
+            )
+            room["contributions"][member_id] = contribution
+        room["track_table"] = compact_track_table(track_table, room["contributions"])
+        return migrated or room["track_table"] is not track_table
+
+    def build_room_preview(room, contributors):
+        return build_indexed_blend_preview(
+            room_track_table(room),
+            contributors,
+            limit=BLEND_PREVIEW_LIMIT,
+            engine=app.config["BLEND_ENGINE"],
+        )
+
+    def room_preview_key(room, contributors):
+        # Everything the preview and its cover art are derived from; unrelated
+        # room writes (joins, empty members) leave the cached preview valid.
+        fingerprint = {
+            "contributors": [
+                [
+                    contributor["id"],
+                    contributor["name"],
+                    contributor["weight"],
+                    room["contributions"][contributor["id"]].get("revision"),
+                    room["contributions"][contributor["id"]].get("updated_at"),
+                ]
+                for contributor in contributors
+            ],
+            "engine": app.config["BLEND_ENGINE"],
+            "limit": BLEND_PREVIEW_LIMIT,
+            "playlist_name": room["playlist_name"],
+        }
+        return hashlib.sha256(dumps(fingerprint, sort_keys=True)).hexdigest()
+
+    def load_room_preview(token, user_id):
+        def ready_room(include_tracks):
+            room = require_room(token, include_tracks=include_tracks)
+            require_room_member(room, user_id)
+            require_room_host(room, user_id)
+            contributors = build_room_contributors(room)
+            return room, contributors, room_preview_key(room, contributors)
+
+        # A cached preview only needs the room header.
+        room, contributors, preview_key = ready_room(False)
+        preview = room_store.get_preview(token, preview_key)
+        if preview is not None:
+            return room, contributors, preview
+
+        room, contributors, preview_key = ready_room(True)
+        preview = build_room_preview(room, contributors)
+        preview["cover_art"] = build_generated_cover_art(
+            room=room,
+            playlist_name=room["playlist_name"],
+            preview=preview,
+            contributors=contributors,
+        )
+        room_store.put_preview(token, preview_key, preview)
+        return room, contributors, preview
+
     def save_room(room):
         set_room_timestamps(room)
         return room_store.save_room(room)
@@ -736,8 +1145,7 @@ def register_routes(app):
                 "client_secret": factory.default_client_secret,
             }
         session["spotify_tokens"] = factory.issue_session(user_id)
-        session["spotify_user"] = user
-        session.modified = True
+        store_spotify_user(user)
         debug_event("e2e.session.seeded", user_id=user_id, configured=set_config)
         return user
 
@@ -856,9 +1264,8 @@ def register_routes(app):
         client = get_spotify_client()
         token_payload = client.exchange_code(code)
         store_spotify_tokens(token_payload)
-        spotify_user = client.get_current_user()
-        session["spotify_user"] = spotify_user
-        session.modified = True
+        spotify_user = store_spotify_user(client.get_current_user())
+        start_source_catalog_warmup(token_payload, spotify_user["id"])
         debug_event("auth.login.completed", user_id=spotify_user["id"])
         return client_redirect(next_room_query({"login": "success"}))
 
@@ -892,11 +1299,12 @@ def register_routes(app):
         return jsonify(summary)
 
     @app.get("/api/me/source-catalog")
-    def source_catalog():
+    async def source_catalog():
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
         refresh = str(request.args.get("refresh") or "").lower() in {"1", "true", "yes"}
-        return jsonify(build_source_catalog(client, user, force_refresh=refresh))
+        catalog = await build_source_catalog(client, user, force_refresh=refresh)
+        return jsonify(catalog)
 
     @app.post("/api/rooms")
     def create_room():
@@ -920,21 +1328,103 @@ def register_routes(app):
         require_room_member(room, user["id"])
         return jsonify(serialize_room(room, user["id"]))
 
+    @app.get("/api/rooms/<token>/events")
+    def room_event_stream(token):
+        client = require_spotify_session()
+        user = fetch_or_get_cached_user(client)
+        if not room_event_slots.acquire(blocking=False):
+            raise ApiError(
+                "Too many live room connections. Poll the room instead.",
+                status_code=503,
+                code="room_events_busy",
+            )
+        # Subscribe before the snapshot so no write can land between the two.
+        subscription = room_events.subscribe(token)
+        released = threading.Lock()
+
+        def release():
+            # Runs from the generator and from the response close, whichever is first.
+            if released.acquire(blocking=False):
+                subscription.close()
+                room_event_slots.release()
+
+        try:
+            room = require_room(token)
+            require_room_member(room, user["id"])
+        except Exception:
+            release()
+            raise
+        keepalive_seconds = app.config["ROOM_EVENT_KEEPALIVE_SECONDS"]
+        # An in-process broker never hears about writes made by other workers,
+        # so the stream also checks the stored version while it is idle.
+        poll_seconds = None if room_events.cross_process else app.config["ROOM_EVENT_POLL_SECONDS"]
+        wait_seconds = min(keepalive_seconds, poll_seconds) if poll_seconds else keepalive_seconds
+
+        # The generator outlives the request context, so it only touches the
+        # room store, the broker and values captured here.
+        def stream(room):
+            try:
+                snapshot = serialize_room(room, user["id"])
+                version = room.get("version", 0)
+                yield format_sse("room", {"version": version, "room": snapshot})
+                sent_at = time.monotonic()
+                while True:
+                    event = subscription.wait(wait_seconds)
+                    if event is None and poll_seconds:
+                        header = room_store.get_room(token)
+                        event = {"deleted": True} if header is None else {"version": header.get("version", 0)}
+                    if event is None or (not event.get("deleted") and event.get("version", 0) <= version):
+                        if time.monotonic() - sent_at >= keepalive_seconds:
+                            sent_at = time.monotonic()
+                            yield ": keep-alive\n\n"
+                        continue
+
+                    room = None if event.get("deleted") else room_store.get_room(token)
+                    if room is None or not find_room_member(room, user["id"]):
+                        yield format_sse("room.closed", {"reason": "deleted" if room is None else "left"})
+                        return
+
+                    current = serialize_room(room, user["id"])
+                    yield format_sse(
+                        "room.diff",
+                        {
+                            "version": room.get("version", 0),
+                            "changes": diff_serialized_room(snapshot, current),
+                        },
+                    )
+                    snapshot, version = current, room.get("version", 0)
+                    sent_at = time.monotonic()
+            finally:
+                release()
+
+        response = Response(
+            stream(room),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # A client that disconnects before the first event never starts the
+        # generator, so its finally block would not run.
+        response.call_on_close(release)
+        return response
+
     @app.post("/api/rooms/<token>/join")
     def join_room(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
 
-        if not find_room_member(room, user["id"]) and len(room["members"]) >= MAX_ROOM_MEMBERS:
-            raise ApiError(
-                "This room is full.",
-                status_code=400,
-                code="room_full",
-            )
+        def join(room):
+            if not find_room_member(room, user["id"]) and len(room["members"]) >= MAX_ROOM_MEMBERS:
+                raise ApiError(
+                    "This room is full.",
+                    status_code=400,
+                    code="room_full",
+                )
 
-        upsert_room_member(room, user)
-        save_room(room)
+            upsert_room_member(room, user)
+            save_room(room)
+            return room
+
+        room = update_room(token, join)
         debug_event("room.joined", room_token=token, user_id=user["id"])
         return jsonify(serialize_room(room, user["id"]))
 
@@ -942,37 +1432,45 @@ def register_routes(app):
     def leave_room(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
-        require_room_member(room, user["id"])
 
-        if room["host_user_id"] == user["id"] and len(room["members"]) > 1:
-            raise ApiError(
-                "The host cannot leave while other members are still in the room.",
-                status_code=400,
-                code="host_cannot_leave",
-            )
+        def leave(room):
+            require_room_member(room, user["id"])
 
-        room["members"] = [member for member in room["members"] if member["id"] != user["id"]]
-        room["contributions"].pop(user["id"], None)
-        room["weights"].pop(user["id"], None)
+            if room["host_user_id"] == user["id"] and len(room["members"]) > 1:
+                raise ApiError(
+                    "The host cannot leave while other members are still in the room.",
+                    status_code=400,
+                    code="host_cannot_leave",
+                )
 
-        if not room["members"]:
-            room_store.delete_room(token)
-            debug_event("room.deleted", room_token=token)
-            return jsonify({"deleted": True})
+            room["members"] = [member for member in room["members"] if member["id"] != user["id"]]
+            refs_remapped = replace_room_contribution(room, user["id"], None)
+            room["weights"].pop(user["id"], None)
 
-        if room["host_user_id"] == user["id"]:
-            room["host_user_id"] = room["members"][0]["id"]
+            if not room["members"]:
+                room_store.delete_room(token)
+                return None
 
-        if not weights_cover_current_contributors(room):
-            rebalance_room_weights(room)
+            if room["host_user_id"] == user["id"]:
+                room["host_user_id"] = room["members"][0]["id"]
+
+            if not weights_cover_current_contributors(room):
+                rebalance_room_weights(room)
+
+            set_room_timestamps(room)
+            room_store.put_contribution(room, user["id"], refs_remapped=refs_remapped)
+            return room
+
+        room = update_room(token, leave, include_tracks=True)
+        if room is None:
+            debug_event("room.deleted", room_token=token)
+            return jsonify({"deleted": True})
 
-        save_room(room)
         debug_event("room.left", room_token=token, user_id=user["id"])
         return jsonify(serialize_room(room, room["members"][0]["id"]))
 
     @app.put("/api/rooms/<token>/contribution")
-    def save_contribution(token):
+    async def save_contribution(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
         room = require_room(token)
@@ -1009,7 +1507,7 @@ def register_routes(app):
 
         playlist_catalog = {
             playlist["id"]: playlist
-            for playlist in build_source_catalog(client, user)["playlists"]
+            for playlist in (await build_source_catalog(client, user))["playlists"]
         }
         invalid_playlist_ids = [playlist_id for playlist_id in playlist_ids if playlist_id not in playlist_catalog]
         if invalid_playlist_ids:
@@ -1020,18 +1518,45 @@ def register_routes(app):
                 details={"playlist_ids": invalid_playlist_ids},
             )
 
-        top_tracks = client.get_current_user_top_tracks(limit=TOP_TRACK_CAP) if use_top_tracks else []
-        saved_tracks = client.get_saved_tracks(limit=SAVED_TRACK_CAP) if use_saved_tracks else []
-        recent_tracks = client.get_recently_played(limit=RECENT_TRACK_CAP) if use_recent_tracks else []
+        # Sources fetched recently are reused, so a save only pays for sources
+        # that were just added or have gone stale.
+        member_sources = []
+        if use_top_tracks:
+            member_sources.append(("top", partial(client.get_current_user_top_tracks, limit=TOP_TRACK_CAP)))
+        if use_saved_tracks:
+            member_sources.append(("saved", partial(client.get_saved_tracks, limit=SAVED_TRACK_CAP)))
+        if use_recent_tracks:
+            member_sources.append(("recent", partial(client.get_recently_played, limit=RECENT_TRACK_CAP)))
+        if use_mood_tracks:
+            member_sources.append((f"mood:{mood_state}", partial(get_mood_tracks, client, mood_state)))
+        fetch_tasks = [
+            (source_key.split(":", 1)[0], partial(fetch_source_tracks, user["id"], source_key, task))
+            for source_key, task in member_sources
+        ]
+        for playlist_id in playlist_ids:
+            fetch_tasks.append(
+                (
+                    f"playlist:{playlist_id}",
+                    partial(
+                        fetch_playlist_tracks,
+                        client,
+                        playlist_id,
+                        playlist_catalog[playlist_id].get("snapshot_id"),
+                    ),
+                )
+            )
+        fetched = await fetch_contribution_sources(user["id"], fetch_tasks)
 
+        top_tracks = fetched.get("top", [])
+        saved_tracks = fetched.get("saved", [])
+        recent_tracks = fetched.get("recent", [])
         selected_playlists = [playlist_catalog[playlist_id] for playlist_id in playlist_ids]
         playlist_tracks = []
         for playlist_id in playlist_ids:
-            playlist_tracks.extend(client.get_playlist_tracks(playlist_id, limit=PLAYLIST_TRACK_CAP))
+            playlist_tracks.extend(fetched[f"playlist:{playlist_id}"])
 
-        mood_tracks = get_mood_tracks(client, mood_state) if use_mood_tracks else []
+        mood_tracks = fetched.get("mood", [])
 
-        had_contribution = bool((room["contributions"].get(user["id"]) or {}).get("track_count"))
         contribution = build_contribution_snapshot(
             use_top_tracks=use_top_tracks,
             use_saved_tracks=use_saved_tracks,
@@ -1047,12 +1572,26 @@ def register_routes(app):
             mood_tracks=mood_tracks,
         )
         contribution["updated_at"] = utc_now_iso()
-        room["contributions"][user["id"]] = contribution
 
-        if (not had_contribution) or (not weights_cover_current_contributors(room)):
-            rebalance_room_weights(room)
+        def store_contribution(room):
+            require_room_member(room, user["id"])
+            had_contribution = bool((room["contributions"].get(user["id"]) or {}).get("track_count"))
+            # The version this write starts from is unique to it, which gives
+            # cached previews a cheap per-contribution revision.
+            refs_remapped = replace_room_contribution(
+                room,
+                user["id"],
+                {**contribution, "revision": room["version"]},
+            )
 
-        save_room(room)
+            if (not had_contribution) or (not weights_cover_current_contributors(room)):
+                rebalance_room_weights(room)
+
+            set_room_timestamps(room)
+            room_store.put_contribution(room, user["id"], refs_remapped=refs_remapped)
+            return room
+
+        room = update_room(token, store_contribution, include_tracks=True)
         debug_event(
             "room.contribution.saved",
             room_token=token,
@@ -1070,70 +1609,78 @@ def register_routes(app):
     def update_room_weights(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
-        require_room_member(room, user["id"])
-        require_room_host(room, user["id"])
-        payload = parse_json_body()
-        members = payload.get("members")
 
-        if not isinstance(members, list) or not members:
-            raise ApiError(
-                "Provide room member weights as an array.",
-                status_code=400,
-                code="invalid_room_weights",
-            )
+        def set_weights(room):
+            require_room_member(room, user["id"])
+            require_room_host(room, user["id"])
+            payload = parse_json_body()
+            members = payload.get("members")
 
-        active_ids = set(contributing_member_ids(room))
-        submitted_ids = {str(member.get("id") or "").strip() for member in members}
-        if submitted_ids != active_ids:
-            raise ApiError(
-                "Room weights must be provided for every member with a saved contribution.",
-                status_code=400,
-                code="invalid_room_weights",
-            )
+            if not isinstance(members, list) or not members:
+                raise ApiError(
+                    "Provide room member weights as an array.",
+                    status_code=400,
+                    code="invalid_room_weights",
+                )
 
-        next_weights = {member["id"]: 0 for member in room["members"]}
-        total_weight = 0
-        for member in members:
-            member_id = str(member.get("id") or "").strip()
-            weight = as_weight(member.get("weight"), f"{member_id}.weight")
-            next_weights[member_id] = weight
-            total_weight += weight
-
-        total_weight = round_to_two(total_weight)
-        if abs(total_weight - 100) > 0.01:
-            raise ApiError(
-                "Room weights must total exactly 100.",
-                status_code=400,
-                code="invalid_room_weights",
-                details={"weight_total": total_weight},
-            )
+            active_ids = set(contributing_member_ids(room))
+            submitted_ids = {str(member.get("id") or "").strip() for member in members}
+            if submitted_ids != active_ids:
+                raise ApiError(
+                    "Room weights must be provided for every member with a saved contribution.",
+                    status_code=400,
+                    code="invalid_room_weights",
+                )
 
-        positive_members = [member_id for member_id in active_ids if next_weights.get(member_id, 0) > 0]
-        if len(positive_members) < 2:
-            raise ApiError(
-                "At least two members must have a positive weight before previewing.",
-                status_code=400,
-                code="invalid_room_weights",
-            )
+            next_weights = {member["id"]: 0 for member in room["members"]}
+            total_weight = 0
+            for member in members:
+                member_id = str(member.get("id") or "").strip()
+                weight = as_weight(member.get("weight"), f"{member_id}.weight")
+                next_weights[member_id] = weight
+                total_weight += weight
 
-        room["weights"] = next_weights
-        save_room(room)
-        debug_event("room.weights.updated", room_token=token, weights=next_weights)
+            total_weight = round_to_two(total_weight)
+            if abs(total_weight - 100) > 0.01:
+                raise ApiError(
+                    "Room weights must total exactly 100.",
+                    status_code=400,
+                    code="invalid_room_weights",
+                    details={"weight_total": total_weight},
+                )
+
+            positive_members = [member_id for member_id in active_ids if next_weights.get(member_id, 0) > 0]
+            if len(positive_members) < 2:
+                raise ApiError(
+                    "At least two members must have a positive weight before previewing.",
+                    status_code=400,
+                    code="invalid_room_weights",
+                )
+
+            set_room_timestamps(room)
+            room_store.set_weights(room, next_weights)
+            return room
+
+        room = update_room(token, set_weights)
+        debug_event("room.weights.updated", room_token=token, weights=room["weights"])
         return jsonify(serialize_room(room, user["id"]))
 
     @app.patch("/api/rooms/<token>/settings")
     def update_room_settings(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
-        require_room_member(room, user["id"])
-        require_room_host(room, user["id"])
-        payload = parse_json_body()
 
-        playlist_name = str(payload.get("playlist_name") or "").strip() or "Sato Blend"
-        room["playlist_name"] = playlist_name[:80]
-        save_room(room)
+        def rename(room):
+            require_room_member(room, user["id"])
+            require_room_host(room, user["id"])
+            payload = parse_json_body()
+
+            playlist_name = str(payload.get("playlist_name") or "").strip() or "Sato Blend"
+            room["playlist_name"] = playlist_name[:80]
+            save_room(room)
+            return room
+
+        room = update_room(token, rename)
         debug_event("room.settings.updated", room_token=token, playlist_name=room["playlist_name"])
         return jsonify(serialize_room(room, user["id"]))
 
@@ -1141,17 +1688,7 @@ def register_routes(app):
     def preview_room(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
-        require_room_member(room, user["id"])
-        require_room_host(room, user["id"])
-        contributors = build_room_contributors(room)
-        preview = build_room_blend_preview(contributors)
-        preview["cover_art"] = build_generated_cover_art(
-            room=room,
-            playlist_name=room["playlist_name"],
-            preview=preview,
-            contributors=contributors,
-        )
+        _, _, preview = load_room_preview(token, user["id"])
         debug_event(
             "room.preview.created",
             room_token=token,
@@ -1161,23 +1698,21 @@ def register_routes(app):
         return jsonify(preview)
 
     @app.post("/api/rooms/<token>/create")
-    def create_room_blend(token):
+    async def create_room_blend(token):
         client = require_spotify_session()
         user = fetch_or_get_cached_user(client)
-        room = require_room(token)
-        require_room_member(room, user["id"])
-        require_room_host(room, user["id"])
-
-        contributors = build_room_contributors(room)
-        preview = build_room_blend_preview(contributors)
-        playlist = client.create_playlist(
-            user_id=user["id"],
-            name=room["playlist_name"],
-            description="Generated by Sato.",
-            is_public=False,
-        )
+        room, contributors, preview = load_room_preview(token, user["id"])
         track_uris = [f"spotify:track:{track['id']}" for track in preview["tracks"]]
-        client.add_tracks_to_playlist(playlist["id"], track_uris)
+        playlist = await run_source(
+            partial(
+                client.create_playlist,
+                user_id=user["id"],
+                name=room["playlist_name"],
+                description="Generated by Sato.",
+                is_public=False,
+            )
+        )
+        await run_source(partial(client.add_tracks_to_playlist, playlist["id"], track_uris))
 
         final_playlist = {
             "id": playlist["id"],
@@ -1186,15 +1721,23 @@ def register_routes(app):
             "tracks_added": len(track_uris),
             "created_at": utc_now_iso(),
         }
-        room["final_playlist"] = final_playlist
-        room["wrapped"] = build_wrapped_artifact(
+        wrapped = build_wrapped_artifact(
             room=room,
             playlist=final_playlist,
             preview=preview,
             contributors=contributors,
+            cover_art=preview["cover_art"] if final_playlist["name"] == room["playlist_name"] else None,
         )
-        room["final_playlist"]["cover_art"] = room["wrapped"]["cover_art"]
-        save_room(room)
+        final_playlist["cover_art"] = wrapped["cover_art"]
+
+        # The Spotify playlist already exists, so conflicts only retry the room write.
+        def store_playlist(room):
+            room["final_playlist"] = final_playlist
+            room["wrapped"] = wrapped
+            save_room(room)
+            return room
+
+        room = update_room(token, store_playlist)
         debug_event(
             "room.playlist.created",
             room_token=token,
@@ -1230,6 +1773,22 @@ def register_routes(app):
         recorder = app.config.get("DEBUG_RECORDER")
         return jsonify((recorder.list_events() if recorder is not None else []))
 
+    @app.get("/api/debug/spotify-stats")
+    def spotify_stats():
+        require_debug_mode()
+        lookups = profile_cache_stats["hits"] + profile_cache_stats["misses"]
+        return jsonify(
+            {
+                "scheduler": app.config["SPOTIFY_REQUEST_SCHEDULER"].stats(),
+                "profile_cache": {
+                    **profile_cache_stats,
+                    "hit_rate": round_to_two(
+                        (profile_cache_stats["hits"] / lookups) * 100 if lookups else 0
+                    ),
+                },
+            }
+        )
+
     @app.post("/api/debug/events/clear")
     def clear_debug_events():
         require_debug_mode()
@@ -1242,6 +1801,8 @@ def register_routes(app):
     def e2e_reset():
         require_e2e_factory()
         room_store.clear()
+        source_catalog_cache.clear()
+        source_result_cache.clear()
         recorder = app.config.get("DEBUG_RECORDER")
         if recorder is not None:
             recorder.clear()
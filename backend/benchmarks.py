@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+
+from cachelib import SimpleCache
+
+from blend_service import (
+    add_to_track_table,
+    build_contribution_snapshot,
+    build_indexed_blend_preview,
+    build_room_blend_preview,
+    build_track_table,
+    normalize_track_snapshot,
+    resolve_blend_engine,
+)
+from room_store import RoomStore
+
+
+def make_tracks(prefix, count, shared=()):
+    raw_tracks = [
+        {
+            "id": f"{prefix}-{index}",
+            "name": f"{prefix.title()} Track {index % 7}",
+            "artists": [{"name": f"{prefix.title()} Artist"}],
+            "album": {"images": [{"url": f"https://images.test/{prefix}-{index}.png"}]},
+        }
+        for index in range(count)
+    ]
+    raw_tracks.extend(
+        {"id": track_id, "name": f"Shared {track_id}", "artists": [], "album": {"images": []}}
+        for track_id in shared
+    )
+    return normalize_track_snapshot(raw_tracks)
+
+
+def timed(function, repeat=1):
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started_at) / repeat * 1000
+
+
+def benchmark_blend_preview():
+    contributions = {
+        f"member-{index}": make_tracks(f"member-{index}", 1600, shared=[f"s{n}" for n in range(200)])
+        for index in range(6)
+    }
+    contributors = [
+        {"id": member_id, "name": member_id, "weight": 100 / 6, "tracks": tracks}
+        for member_id, tracks in contributions.items()
+    ]
+    track_table = build_track_table({key: {"tracks": value} for key, value in contributions.items()})
+
+    _, full_ms = timed(lambda: build_room_blend_preview(contributors, limit=50))
+    _, indexed_ms = timed(lambda: build_indexed_blend_preview(track_table, contributors, limit=50))
+    timings = f"full={full_ms:.1f}ms indexed={indexed_ms:.1f}ms"
+    if resolve_blend_engine("numpy") == "numpy":
+        _, numpy_ms = timed(
+            lambda: build_indexed_blend_preview(track_table, contributors, limit=50, engine="numpy")
+        )
+        timings += f" numpy={numpy_ms:.1f}ms"
+    print(f"blend preview 6x1600: {timings}")
+
+
+def benchmark_room_store():
+    for track_count in (100, 1000, 5000):
+        store = RoomStore(cachelib=SimpleCache(threshold=100), ttl_seconds=60)
+        room = store.create_room(host_user_id="host", playlist_name="Blend")
+        for index in range(6):
+            member_id = f"member-{index}"
+            tracks = [
+                {"id": f"{index}-{n}", "name": str(n), "artists": [], "image": None}
+                for n in range(track_count)
+            ]
+            room["contributions"][member_id] = {
+                "track_count": track_count,
+                "track_refs": add_to_track_table(room["track_table"], member_id, tracks),
+            }
+        store.save_room(room)
+        token = room["token"]
+
+        _, header_ms = timed(lambda: store.get_room(token), repeat=20)
+        room, full_ms = timed(lambda: store.get_room(token, include_tracks=True), repeat=20)
+        _, save_ms = timed(lambda: store.save_room(room), repeat=20)
+        print(
+            f"room store {track_count * 6} tracks: header={header_ms:.2f}ms "
+            f"full={full_ms:.2f}ms save={save_ms:.2f}ms"
+        )
+
+
+def benchmark_contribution_snapshot():
+    def raw(prefix, count, shared=()):
+        tracks = [
+            {"id": f"{prefix}-{index}", "name": f"{prefix} {index}", "artists": [{"name": prefix}]}
+            for index in range(count)
+        ]
+        tracks.extend({"id": track_id, "name": track_id, "artists": []} for track_id in shared)
+        return [{"track": track} for track in tracks]
+
+    shared = [f"s{n}" for n in range(300)]
+    _, snapshot_ms = timed(
+        lambda: build_contribution_snapshot(
+            use_top_tracks=True,
+            use_saved_tracks=True,
+            use_recent_tracks=True,
+            playlist_ids=["list-a", "list-b"],
+            selected_playlists=[{"id": "list-a"}, {"id": "list-b"}],
+            use_mood_tracks=True,
+            mood_state="happy",
+            top_tracks=raw("top", 50, shared[:20]),
+            saved_tracks=raw("saved", 500, shared),
+            recent_tracks=raw("recent", 50, shared[:10]),
+            playlist_tracks=raw("list-a", 500, shared) + raw("list-b", 500, shared),
+            mood_tracks=raw("mood", 40, shared[:5]),
+        ),
+        repeat=20,
+    )
+    print(f"contribution snapshot 2.3k raw tracks: {snapshot_ms:.1f}ms")
+
+
+BENCHMARKS = [benchmark_blend_preview, benchmark_room_store, benchmark_contribution_snapshot]
+
+
+if __name__ == "__main__":
+    for benchmark in BENCHMARKS:
+        benchmark()
@@ -2,8 +2,14 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import heapq
 from html import escape
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional scoring accelerator
+    np = None
+
 
 class BlendValidationError(Exception):
     def __init__(self, message, details=None):
@@ -16,6 +22,14 @@ def round_to_two(value):
     return round(float(value), 2)
 
 
+def resolve_blend_engine(engine):
+    # The numpy engine is opt-in: it only pays off once rooms hold many
+    # contributors, and it falls back to Python when numpy is missing.
+    if engine == "numpy" and np is not None:
+        return "numpy"
+    return "python"
+
+
 def _extract_track(track_or_item):
     track = (
         track_or_item.get("track")
@@ -31,7 +45,9 @@ def _extract_track(track_or_item):
     if not track_id:
         return None
 
-    if track.get("artists") and isinstance(track.get("artists")[0], str):
+    # Rows this module already normalized (cached playlists and source results)
+    # pass through as stored; a Spotify track always carries an album instead.
+    if "image" in track and "album" not in track:
         return {
             "id": track_id,
             "name": track.get("name") or "Unknown track",
@@ -55,18 +71,40 @@ def _extract_track(track_or_item):
     }
 
 
-def normalize_track_snapshot(raw_tracks):
-    deduped_tracks = {}
-    for raw_track in raw_tracks:
-        track = _extract_track(raw_track)
-        if not track:
-            continue
-        deduped_tracks.setdefault(track["id"], track)
+def _track_id(track_or_item):
+    track = (
+        track_or_item.get("track")
+        if isinstance(track_or_item, dict) and "track" in track_or_item
+        else track_or_item
+    )
+    if not isinstance(track, dict) or track.get("is_local"):
+        return None
+    return track.get("id") or None
+
 
-    return sorted(
+def normalize_tagged_sources(sources):
+    deduped_tracks = {}
+    source_track_ids = {}
+    for tag, raw_tracks in sources:
+        seen_track_ids = source_track_ids.setdefault(tag, set())
+        for raw_track in raw_tracks:
+            # Repeats across sources only need their id, not a second extraction.
+            track_id = _track_id(raw_track)
+            if track_id is None:
+                continue
+            seen_track_ids.add(track_id)
+            if track_id not in deduped_tracks:
+                deduped_tracks[track_id] = _extract_track(raw_track)
+
+    tracks = sorted(
         deduped_tracks.values(),
         key=lambda track: (track["name"].lower(), track["id"]),
     )
+    return tracks, {tag: len(track_ids) for tag, track_ids in source_track_ids.items()}
+
+
+def normalize_track_snapshot(raw_tracks):
+    return normalize_tagged_sources([(None, raw_tracks)])[0]
 
 
 def build_contribution_snapshot(
@@ -95,18 +133,18 @@ def build_contribution_snapshot(
             "Choose at least one Spotify source before saving your contribution."
         )
 
-    snapshot_tracks = []
+    sources = []
     if use_top_tracks:
-        snapshot_tracks.extend(top_tracks)
+        sources.append(("top", top_tracks))
     if use_saved_tracks:
-        snapshot_tracks.extend(saved_tracks)
+        sources.append(("saved", saved_tracks))
     if use_recent_tracks:
-        snapshot_tracks.extend(recent_tracks)
-    snapshot_tracks.extend(playlist_tracks)
+        sources.append(("recent", recent_tracks))
+    sources.append(("playlist", playlist_tracks))
     if use_mood_tracks and mood_tracks:
-        snapshot_tracks.extend(mood_tracks)
+        sources.append(("mood", mood_tracks))
 
-    normalized_tracks = normalize_track_snapshot(snapshot_tracks)
+    normalized_tracks, source_counts = normalize_tagged_sources(sources)
     if not normalized_tracks:
         raise BlendValidationError(
             "The selected Spotify sources did not contain any usable tracks."
@@ -121,19 +159,19 @@ def build_contribution_snapshot(
         "playlist_ids": playlist_ids,
         "playlists": selected_playlists,
         "source_summary": {
-            "top_tracks_count": len(normalize_track_snapshot(top_tracks)) if use_top_tracks else 0,
-            "saved_tracks_count": len(normalize_track_snapshot(saved_tracks)) if use_saved_tracks else 0,
-            "recent_tracks_count": len(normalize_track_snapshot(recent_tracks)) if use_recent_tracks else 0,
+            "top_tracks_count": source_counts.get("top", 0),
+            "saved_tracks_count": source_counts.get("saved", 0),
+            "recent_tracks_count": source_counts.get("recent", 0),
             "playlist_count": len(selected_playlists),
-            "playlist_track_count": len(normalize_track_snapshot(playlist_tracks)),
-            "mood_tracks_count": len(normalize_track_snapshot(mood_tracks or [])) if use_mood_tracks else 0,
+            "playlist_track_count": source_counts["playlist"],
+            "mood_tracks_count": source_counts.get("mood", 0),
         },
         "track_count": len(normalized_tracks),
         "tracks": normalized_tracks,
     }
 
 
-def _add_track_scores(track_scores, contributor, tracks):
+def _add_track_scores(track_scores, contributor_position, contributor, tracks):
     weight = contributor["weight"]
     if weight <= 0:
         return
@@ -145,22 +183,11 @@ def _add_track_scores(track_scores, contributor, tracks):
             continue
 
         seen_track_ids.add(track["id"])
-        existing_track = track_scores.setdefault(
-            track["id"],
-            {
-                **track,
-                "score": 0.0,
-                "contributors": [],
-            },
-        )
-        existing_track["score"] += weight
-        existing_track["contributors"].append(
-            {
-                "source_id": contributor["id"],
-                "source_name": contributor["name"],
-                "weight": round_to_two(weight),
-            }
-        )
+        entry = track_scores.get(track["id"])
+        if entry is None:
+            entry = track_scores[track["id"]] = {"track": track, "score": 0.0, "members": []}
+        entry["score"] += weight
+        entry["members"].append(contributor_position)
 
 
 def _format_member_list(names):
@@ -178,7 +205,6 @@ def build_overlap_stats(preview_tracks, contributors):
     association_count = 0
     shared_tracks = 0
     unique_tracks = 0
-    contributor_names = {contributor["id"]: contributor["name"] for contributor in contributors}
 
     for track in preview_tracks:
         contributor_ids = [contributor["source_id"] for contributor in track["contributors"]]
@@ -193,6 +219,26 @@ def build_overlap_stats(preview_tracks, contributors):
                 pair_key = tuple(sorted((left_id, right_id)))
                 pair_overlap[pair_key] = pair_overlap.get(pair_key, 0) + 1
 
+    return _summarize_overlap(
+        pair_overlap,
+        contributors,
+        association_count=association_count,
+        shared_tracks=shared_tracks,
+        unique_tracks=unique_tracks,
+        total_tracks=len(preview_tracks),
+    )
+
+
+def _summarize_overlap(
+    pair_overlap,
+    contributors,
+    *,
+    association_count,
+    shared_tracks,
+    unique_tracks,
+    total_tracks,
+):
+    contributor_names = {contributor["id"]: contributor["name"] for contributor in contributors}
     strongest_pair = None
     if pair_overlap:
         pair_key, shared_count = max(
@@ -211,7 +257,6 @@ def build_overlap_stats(preview_tracks, contributors):
             "shared_tracks": shared_count,
         }
 
-    total_tracks = len(preview_tracks)
     return {
         "shared_tracks": shared_tracks,
         "unique_tracks": unique_tracks,
@@ -248,43 +293,179 @@ def _build_track_reason(track):
     return overlap_count, total_weight, score_breakdown, why_it_ranked
 
 
+def empty_track_table():
+    return {"ids": [], "names": [], "artists": [], "images": [], "members": []}
+
+
+def table_track(track_table, row):
+    return {
+        "id": track_table["ids"][row],
+        "name": track_table["names"][row],
+        "artists": track_table["artists"][row],
+        "image": track_table["images"][row],
+    }
+
+
+def table_tracks(track_table, track_refs):
+    return [table_track(track_table, row) for row in track_refs]
+
+
+def add_to_track_table(track_table, member_id, tracks):
+    rows = {track_id: row for row, track_id in enumerate(track_table["ids"])}
+    track_refs = []
+    for track in tracks:
+        row = rows.get(track["id"])
+        if row is None:
+            row = rows[track["id"]] = len(track_table["ids"])
+            track_table["ids"].append(track["id"])
+            track_table["names"].append(track["name"])
+            track_table["artists"].append(track["artists"])
+            track_table["images"].append(track["image"])
+            track_table["members"].append([])
+        if member_id not in track_table["members"][row]:
+            track_table["members"][row].append(member_id)
+        track_refs.append(row)
+    return track_refs
+
+
+def remove_from_track_table(track_table, member_id, track_refs):
+    for row in track_refs:
+        members = track_table["members"][row]
+        if member_id in members:
+            members.remove(member_id)
+    return track_table
+
+
+def compact_track_table(track_table, contributions):
+    live_rows = [row for row, members in enumerate(track_table["members"]) if members]
+    if len(live_rows) * 2 > len(track_table["ids"]):
+        return track_table
+
+    remapped_rows = {row: index for index, row in enumerate(live_rows)}
+    compacted = {column: [values[row] for row in live_rows] for column, values in track_table.items()}
+    for contribution in contributions.values():
+        contribution["track_refs"] = [remapped_rows[row] for row in contribution["track_refs"]]
+    return compacted
+
+
+def build_track_table(contributions):
+    track_table = empty_track_table()
+    for member_id, contribution in contributions.items():
+        contribution["track_refs"] = add_to_track_table(
+            track_table,
+            member_id,
+            contribution.pop("tracks", None) or [],
+        )
+    return track_table
+
+
 def build_room_blend_preview(contributors, limit=50):
     track_scores = {}
     active_contributors = [contributor for contributor in contributors if contributor["weight"] > 0]
 
-    for contributor in active_contributors:
+    for position, contributor in enumerate(active_contributors):
         _add_track_scores(
             track_scores=track_scores,
+            contributor_position=position,
             contributor=contributor,
             tracks=contributor["tracks"],
         )
 
-    ranked_tracks = sorted(
-        track_scores.values(),
-        key=lambda track: (-track["score"], track["name"].lower(), track["id"]),
-    )[:limit]
+    return _rank_blend_preview(track_scores, active_contributors, limit)
 
-    for track in ranked_tracks:
-        track["score"] = round_to_two(track["score"])
-        track["contributors"] = sorted(
-            track["contributors"],
+
+def build_indexed_blend_preview(track_table, contributors, limit=50, engine="python"):
+    active_contributors = [contributor for contributor in contributors if contributor["weight"] > 0]
+    if resolve_blend_engine(engine) == "numpy":
+        return _build_numpy_blend_preview(track_table, active_contributors, limit)
+
+    positions = {contributor["id"]: index for index, contributor in enumerate(active_contributors)}
+    track_scores = []
+    for row, members in enumerate(track_table["members"]):
+        member_positions = sorted(
+            positions[member_id] for member_id in members if member_id in positions
+        )
+        if not member_positions:
+            continue
+
+        score = 0.0
+        for position in member_positions:
+            score += active_contributors[position]["weight"]
+        track_scores.append({"row": row, "score": score, "members": member_positions})
+
+    survivors = heapq.nsmallest(limit, track_scores, key=_table_rank_key(track_table))
+    ranked_tracks = []
+    for entry in survivors:
+        entry["track"] = table_track(track_table, entry["row"])
+        ranked_tracks.append(_build_ranked_track(entry, active_contributors))
+
+    return _preview_payload(
+        ranked_tracks,
+        active_contributors,
+        total_tracks=len(track_scores),
+        overlap_stats=build_overlap_stats(ranked_tracks, active_contributors),
+    )
+
+
+def _table_rank_key(track_table):
+    names = track_table["names"]
+    track_ids = track_table["ids"]
+    return lambda entry: (-entry["score"], names[entry["row"]].lower(), track_ids[entry["row"]])
+
+
+def _rank_key(entry):
+    track = entry["track"]
+    return (-entry["score"], track["name"].lower(), track["id"])
+
+
+def _build_ranked_track(entry, active_contributors):
+    contributors = [
+        {
+            "source_id": contributor["id"],
+            "source_name": contributor["name"],
+            "weight": round_to_two(contributor["weight"]),
+        }
+        for contributor in (active_contributors[position] for position in entry["members"])
+    ]
+    track = {
+        **entry["track"],
+        "score": round_to_two(entry["score"]),
+        "contributors": sorted(
+            contributors,
             key=lambda contributor: (
                 -contributor["weight"],
                 contributor["source_name"].lower(),
             ),
-        )
-        overlap_count, total_weight, score_breakdown, why_it_ranked = _build_track_reason(track)
-        track["overlap_count"] = overlap_count
-        track["combined_weight"] = total_weight
-        track["score_breakdown"] = score_breakdown
-        track["why_it_ranked"] = why_it_ranked
+        ),
+    }
+    overlap_count, total_weight, score_breakdown, why_it_ranked = _build_track_reason(track)
+    track["overlap_count"] = overlap_count
+    track["combined_weight"] = total_weight
+    track["score_breakdown"] = score_breakdown
+    track["why_it_ranked"] = why_it_ranked
+    return track
+
+
+def _rank_blend_preview(track_scores, active_contributors, limit):
+    # nsmallest keeps the exact order of sorted(...)[:limit] without sorting every
+    # scored track, and contributor details are only built for the survivors.
+    ranked_tracks = [
+        _build_ranked_track(entry, active_contributors)
+        for entry in heapq.nsmallest(limit, track_scores.values(), key=_rank_key)
+    ]
+    return _preview_payload(
+        ranked_tracks,
+        active_contributors,
+        total_tracks=len(track_scores),
+        overlap_stats=build_overlap_stats(ranked_tracks, active_contributors),
+    )
 
-    overlap_stats = build_overlap_stats(ranked_tracks, active_contributors)
 
+def _preview_payload(ranked_tracks, active_contributors, *, total_tracks, overlap_stats):
     return {
         "tracks": ranked_tracks,
         "summary": {
-            "total_tracks": len(track_scores),
+            "total_tracks": total_tracks,
             "total_contributors": len(active_contributors),
             "overlap_stats": overlap_stats,
             "contributors": [
@@ -292,7 +473,11 @@ def build_room_blend_preview(contributors, limit=50):
                     "id": contributor["id"],
                     "name": contributor["name"],
                     "weight": round_to_two(contributor["weight"]),
-                    "track_count": len(contributor["tracks"]),
+                    "track_count": (
+                        contributor["track_count"]
+                        if "track_count" in contributor
+                        else len(contributor["tracks"])
+                    ),
                 }
                 for contributor in active_contributors
             ],
@@ -300,6 +485,78 @@ def build_room_blend_preview(contributors, limit=50):
     }
 
 
+def _build_numpy_blend_preview(track_table, active_contributors, limit):
+    positions = {contributor["id"]: index for index, contributor in enumerate(active_contributors)}
+    rows = []
+    columns = []
+    for column, members in enumerate(track_table["members"]):
+        for member_id in members:
+            position = positions.get(member_id)
+            if position is not None:
+                rows.append(position)
+                columns.append(column)
+
+    membership = np.zeros((len(active_contributors), len(track_table["ids"])), dtype=bool)
+    membership[rows, columns] = True
+
+    # Accumulating one contributor row at a time adds weights in the same order
+    # as the Python engine, so scores (and therefore tie-breaks) match bit for bit.
+    scores = np.zeros(len(track_table["ids"]))
+    for position, contributor in enumerate(active_contributors):
+        scores += membership[position] * contributor["weight"]
+
+    scored_columns = np.flatnonzero(membership.any(axis=0))
+    candidate_columns = scored_columns if limit > 0 else scored_columns[:0]
+    if 0 < limit < len(scored_columns):
+        scored = scores[scored_columns]
+        threshold = np.partition(scored, len(scored) - limit)[len(scored) - limit]
+        candidate_columns = scored_columns[scored >= threshold]
+
+    survivors = heapq.nsmallest(
+        limit,
+        (
+            {"row": column, "score": float(scores[column])}
+            for column in candidate_columns.tolist()
+        ),
+        key=_table_rank_key(track_table),
+    )
+    for entry in survivors:
+        entry["track"] = table_track(track_table, entry["row"])
+        entry["members"] = np.flatnonzero(membership[:, entry["row"]]).tolist()
+    ranked_tracks = [_build_ranked_track(entry, active_contributors) for entry in survivors]
+
+    survivor_matrix = membership[:, [entry["row"] for entry in survivors]].astype(np.int64)
+    pair_counts = survivor_matrix @ survivor_matrix.T
+    contributors_per_track = survivor_matrix.sum(axis=0)
+
+    # Pairs are listed in first-seen order so max() breaks ties like build_overlap_stats.
+    pair_overlap = {}
+    for track in ranked_tracks:
+        contributor_ids = [contributor["source_id"] for contributor in track["contributors"]]
+        for index, left_id in enumerate(contributor_ids):
+            for right_id in contributor_ids[index + 1 :]:
+                pair_key = tuple(sorted((left_id, right_id)))
+                if pair_key not in pair_overlap:
+                    pair_overlap[pair_key] = int(
+                        pair_counts[positions[pair_key[0]], positions[pair_key[1]]]
+                    )
+
+    overlap_stats = _summarize_overlap(
+        pair_overlap,
+        active_contributors,
+        association_count=int(contributors_per_track.sum()),
+        shared_tracks=int((contributors_per_track >= 2).sum()),
+        unique_tracks=int((contributors_per_track == 1).sum()),
+        total_tracks=len(ranked_tracks),
+    )
+    return _preview_payload(
+        ranked_tracks,
+        active_contributors,
+        total_tracks=len(scored_columns),
+        overlap_stats=overlap_stats,
+    )
+
+
 def _contribution_counts(preview_tracks, contributors):
     surviving_counts = {contributor["id"]: 0 for contributor in contributors}
     unique_counts = {contributor["id"]: 0 for contributor in contributors}
@@ -447,7 +704,7 @@ def _build_share_text(room, playlist, preview, overlap_stats):
     )
 
 
-def build_wrapped_artifact(room, playlist, preview, contributors):
+def build_wrapped_artifact(room, playlist, preview, contributors, cover_art=None):
     surviving_counts, unique_counts, shared_favorites = _contribution_counts(
         preview["tracks"], contributors
     )
@@ -456,12 +713,13 @@ def build_wrapped_artifact(room, playlist, preview, contributors):
     overlap_stats = preview["summary"].get("overlap_stats") or build_overlap_stats(
         preview["tracks"], contributors
     )
-    cover_art = build_generated_cover_art(
-        room=room,
-        playlist_name=playlist["name"],
-        preview=preview,
-        contributors=contributors,
-    )
+    if cover_art is None:
+        cover_art = build_generated_cover_art(
+            room=room,
+            playlist_name=playlist["name"],
+            preview=preview,
+            contributors=contributors,
+        )
     share_text = _build_share_text(room, playlist, preview, overlap_stats)
 
     return {
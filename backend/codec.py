@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import zlib
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional speedup
+    msgspec = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional compression
+    zstandard = None
+
+
+JSON_CODEC = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+ROOM_COMPRESSION_THRESHOLD = 64 * 1024
+
+# Compressed blobs start with a NUL byte, which never begins a JSON document.
+ZLIB_PREFIX = b"\x00z"
+ZSTD_PREFIX = b"\x00s"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+    )
+
+
+def dumps(value, *, sort_keys=False, default=None):
+    if orjson is not None:
+        options = _ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, default=default, option=options)
+    if msgspec is not None:
+        return msgspec.json.encode(value, enc_hook=default, order="sorted" if sort_keys else None)
+    return json.dumps(
+        value,
+        default=default,
+        sort_keys=sort_keys,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def dumps_text(value, **kwargs):
+    return dumps(value, **kwargs).decode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def resolve_compression(compression):
+    if compression in {None, "", "none"}:
+        return None
+    if compression == "zstd" and zstandard is None:
+        return "zlib"
+    if compression not in {"zlib", "zstd"}:
+        raise ValueError(f"Unknown room compression: {compression}")
+    return compression
+
+
+def encode_blob(value, *, compression=None, threshold=ROOM_COMPRESSION_THRESHOLD):
+    data = dumps(value)
+    compression = resolve_compression(compression)
+    if compression is None or len(data) < threshold:
+        return data
+    if compression == "zstd":
+        return ZSTD_PREFIX + zstandard.ZstdCompressor().compress(data)
+    return ZLIB_PREFIX + zlib.compress(data, 6)
+
+
+def decode_blob(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+        if data.startswith(ZSTD_PREFIX):
+            if zstandard is None:
+                raise ValueError("This room was stored with zstd, but zstandard is not installed.")
+            data = zstandard.ZstdDecompressor().decompress(data[len(ZSTD_PREFIX):])
+        elif data.startswith(ZLIB_PREFIX):
+            data = zlib.decompress(data[len(ZLIB_PREFIX):])
+    return loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_text(obj, sort_keys=self.sort_keys, default=self.default)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            dumps(obj, sort_keys=self.sort_keys, default=self.default) + b"\n",
+            mimetype=self.mimetype,
+        )
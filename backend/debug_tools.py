@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
 import logging
 from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
 
+from codec import dumps_text
+
 
 def utc_now_iso():
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
@@ -27,7 +28,7 @@ class DebugRecorder:
 
         if self.log_path is not None:
             with self.log_path.open("a", encoding="utf-8") as handle:
-                handle.write(json.dumps(entry, sort_keys=True))
+                handle.write(dumps_text(entry, sort_keys=True))
                 handle.write("\n")
 
         return entry
@@ -272,6 +272,9 @@ class E2EFakeSpotifyClient:
     def get_current_user_playlists(self, limit=200):
         return deepcopy(self.factory.current_user_playlists[self._current_user_id()][:limit])
 
+    def get_playlist_snapshot_id(self, playlist_id):
+        return f"e2e-snapshot-{playlist_id}"
+
     def get_playlist_tracks(self, playlist_id, limit=500):
         return deepcopy(self.factory.playlist_tracks[playlist_id][:limit])
 
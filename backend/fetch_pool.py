@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import threading
+import weakref
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+
+DEFAULT_FETCH_CONCURRENCY = 4
+DEFAULT_WARMUP_WORKERS = 2
+SOURCE_POOL_WORKERS = 32
+PAGE_POOL_WORKERS = 16
+LIMIT_POLL_SECONDS = 0.01
+
+
+class SourceFetcher:
+    def __init__(self, *, max_workers=DEFAULT_FETCH_CONCURRENCY):
+        self.max_workers = max(1, int(max_workers))
+        self._user_limits = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def _user_limit(self, user_id):
+        with self._lock:
+            limit = self._user_limits.get(user_id)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.max_workers)
+                self._user_limits[user_id] = limit
+            return limit
+
+    def run(self, tasks, *, user_id=None):
+        tasks = list(tasks)
+        if not tasks:
+            return []
+
+        limit = self._user_limit(user_id)
+        cancelled = threading.Event()
+
+        def guarded(task):
+            with limit:
+                if cancelled.is_set():
+                    return None
+                try:
+                    return task()
+                except BaseException:
+                    cancelled.set()
+                    raise
+
+        # Page tasks never fan out again, and a nested run inline keeps them
+        # from waiting on the pool they occupy.
+        if self.max_workers == 1 or len(tasks) == 1 or getattr(_pool_thread, "pages", False):
+            return [guarded(task) for task in tasks]
+
+        futures = [_page_executor.submit(guarded, task) for task in tasks]
+        try:
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    raise future.exception()
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def run_async(self, tasks, *, user_id=None):
+        tasks = list(tasks)
+        if not tasks:
+            return []
+
+        # Tasks copy the context they are created in, so every Spotify call a
+        # task makes through run_source counts against this user's limit.
+        context_token = _current_user_limit.set(self._user_limit(user_id))
+        try:
+            futures = [asyncio.ensure_future(run_source(task)) for task in tasks]
+        finally:
+            _current_user_limit.reset(context_token)
+        try:
+            return await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+class BackgroundWarmer:
+    def __init__(self, *, max_workers=DEFAULT_WARMUP_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_workers)),
+            thread_name_prefix="sato-warmup",
+        )
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, task):
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(task)
+            self._futures[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def pending(self, key):
+        with self._lock:
+            return self._futures.get(key)
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+
+async def run_source(task):
+    if inspect.iscoroutinefunction(task):
+        return await task()
+
+    limit = _current_user_limit.get()
+    if limit is not None:
+        # Polling keeps a cancelled waiter from taking a slot it never frees.
+        while not limit.acquire(blocking=False):
+            await asyncio.sleep(LIMIT_POLL_SECONDS)
+    # The context copy lets sync clients still see the request context.
+    try:
+        future = _source_executor.submit(contextvars.copy_context().run, task)
+    except BaseException:
+        if limit is not None:
+            limit.release()
+        raise
+    if limit is not None:
+        # Cancelling the awaiting task cannot stop a running thread, so the slot
+        # is only freed once the call itself finishes or never starts.
+        future.add_done_callback(lambda _: limit.release())
+    return await asyncio.wrap_future(future)
+
+
+def _mark_page_thread():
+    _pool_thread.pages = True
+
+
+_pool_thread = threading.local()
+_current_user_limit = contextvars.ContextVar("sato_fetch_user_limit", default=None)
+# Shared by every request in the process, so Spotify fan-out is bounded by
+# these pools rather than by sources times page fan-out per request.
+_source_executor = ThreadPoolExecutor(
+    max_workers=SOURCE_POOL_WORKERS,
+    thread_name_prefix="sato-fetch",
+)
+_page_executor = ThreadPoolExecutor(
+    max_workers=PAGE_POOL_WORKERS,
+    thread_name_prefix="sato-pages",
+    initializer=_mark_page_thread,
+)
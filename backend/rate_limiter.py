@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+
+# Spotify does not publish a fixed budget, so requests are not paced up front
+# by default; every client just waits out the Retry-After of a 429 together.
+DEFAULT_RATE_PER_SECOND = 0.0
+DEFAULT_BURST = 20
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        *,
+        rate_per_second=DEFAULT_RATE_PER_SECOND,
+        burst=DEFAULT_BURST,
+        max_retries=3,
+        base_backoff_seconds=0.5,
+        max_wait_seconds=30.0,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        jitter=random.random,
+    ):
+        self.rate_per_second = max(float(rate_per_second or 0), 0.0)
+        self.burst = max(int(burst), 1)
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._jitter = jitter
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+        self._counters = {"throttled": 0, "retried": 0, "dropped": 0}
+
+    def _refill(self, now):
+        elapsed = max(now - self._updated_at, 0.0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_second)
+        self._updated_at = now
+
+    def reserve(self):
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait_seconds = self._blocked_until - now
+            if wait_seconds <= 0:
+                if not self.rate_per_second:
+                    return 0.0
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return 0.0
+                wait_seconds = (1 - self._tokens) / self.rate_per_second
+            return wait_seconds
+
+    def acquire(self):
+        while True:
+            wait_seconds = self.reserve()
+            if wait_seconds <= 0:
+                return
+            self._sleep(wait_seconds)
+
+    def backoff(self, attempt, retry_after=None):
+        with self._lock:
+            self._counters["throttled"] += 1
+            if attempt >= self.max_retries:
+                self._counters["dropped"] += 1
+                return None
+
+            delay = (
+                float(retry_after)
+                if retry_after is not None
+                else self.base_backoff_seconds * (2 ** attempt)
+            )
+            delay += self._jitter() * self.base_backoff_seconds
+            if delay > self.max_wait_seconds:
+                self._counters["dropped"] += 1
+                return None
+
+            # Every client sharing this scheduler waits out the same window.
+            self._blocked_until = max(self._blocked_until, self._clock() + delay)
+            self._counters["retried"] += 1
+            return delay
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+def parse_retry_after(response):
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+default_scheduler = RequestScheduler()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+import threading
+
+from codec import dumps, loads
+
+
+ROOM_EVENT_CHANNEL_PREFIX = "sato:room-events:"
+ROOM_EVENT_KEEPALIVE_SECONDS = 15
+ROOM_EVENT_POLL_SECONDS = 2
+ROOM_EVENT_MAX_STREAMS = 32
+ROOM_EVENT_SUBSCRIBE_TIMEOUT_SECONDS = 5
+
+logger = logging.getLogger("sato")
+
+
+class RoomSubscription:
+    def __init__(self, broker, token):
+        self.broker = broker
+        self.token = token
+        self._condition = threading.Condition()
+        self._event = None
+
+    def notify(self, event):
+        # Only the newest event matters: listeners reload the room anyway.
+        with self._condition:
+            self._event = event
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        with self._condition:
+            if self._event is None:
+                self._condition.wait(timeout)
+            event, self._event = self._event, None
+            return event
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class RoomEventBroker:
+    # Events only reach subscribers in the publishing process.
+    cross_process = False
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, token):
+        subscription = RoomSubscription(self, token)
+        with self._lock:
+            self._subscriptions.setdefault(token, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.token)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.token]
+
+    def subscriber_count(self, token):
+        with self._lock:
+            return len(self._subscriptions.get(token, ()))
+
+    def publish(self, token, event):
+        self.dispatch(token, event)
+
+    def dispatch(self, token, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(token, ()))
+        for subscription in subscriptions:
+            subscription.notify(event)
+
+
+class RedisRoomEventBroker(RoomEventBroker):
+    cross_process = True
+
+    def __init__(self, redis_client):
+        super().__init__()
+        self.redis_client = redis_client
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, token):
+        self._ensure_listener()
+        return super().subscribe(token)
+
+    def publish(self, token, event):
+        # Delivery to local subscribers comes back through the listener, so
+        # every worker sees the same stream.
+        self.redis_client.publish(f"{ROOM_EVENT_CHANNEL_PREFIX}{token}", dumps(event))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            ready = threading.Event()
+            self._listener = threading.Thread(
+                target=self._listen,
+                args=(ready,),
+                name="sato-room-events",
+                daemon=True,
+            )
+            self._listener.start()
+            # Hold the first subscriber until Redis confirms the pattern, so an
+            # event published right after subscribe() returns is not missed.
+            if not ready.wait(ROOM_EVENT_SUBSCRIBE_TIMEOUT_SECONDS):
+                logger.warning("Room event subscription was not confirmed in time.")
+
+    def _listen(self, ready):
+        pubsub = self.redis_client.pubsub()
+        try:
+            pubsub.psubscribe(f"{ROOM_EVENT_CHANNEL_PREFIX}*")
+            for message in pubsub.listen():
+                if message.get("type") == "psubscribe":
+                    ready.set()
+                    continue
+                if message.get("type") != "pmessage":
+                    continue
+                channel = message.get("channel")
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                token = str(channel or "")[len(ROOM_EVENT_CHANNEL_PREFIX):]
+                try:
+                    event = loads(message.get("data"))
+                except ValueError:
+                    logger.warning("Ignoring malformed room event on %s.", channel)
+                    continue
+                self.dispatch(token, event)
+        except Exception:  # pragma: no cover - the next subscriber restarts the listener
+            logger.exception("Room event listener stopped.")
+        finally:
+            ready.set()
+            pubsub.close()
+
+
+def diff_serialized_room(previous, current):
+    return {
+        key: value
+        for key, value in current.items()
+        if key not in previous or previous[key] != value
+    }
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
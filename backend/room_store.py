@@ -1,34 +1,240 @@
 from __future__ import annotations
 
-import json
+import heapq
+import logging
+import os
 import secrets
-from copy import deepcopy
+import threading
+import time
+import zlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 
+from blend_service import empty_track_table
+from codec import ROOM_COMPRESSION_THRESHOLD, decode_blob, dumps, encode_blob, resolve_compression
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # pragma: no cover - redis is optional in local cachelib mode
+    WatchError = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - file locks are POSIX only
+    fcntl = None
+
 
 ROOM_TOKEN_BYTES = 8
+ROOM_LOCK_STRIPES = 64
+ROOM_EXPIRY_INDEX_KEY = "sato:room-expiry-index"
+ROOM_SWEEP_INTERVAL_SECONDS = 5 * 60
+
+logger = logging.getLogger("sato")
+
+
+class RoomConflictError(Exception):
+    pass
+
+
+class RoomDataLostError(Exception):
+    pass
 
 
 def utc_now_iso():
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+class RoomExpiryIndex:
+    def __init__(self, cachelib, *, ttl_seconds, lock):
+        self.cachelib = cachelib
+        self.ttl_seconds = ttl_seconds
+        self.lock = lock
+        self._entries = {}
+        self._heap = []
+        self._queued = {}
+        self._removed = set()
+        self._lock = threading.Lock()
+        self.sync()
+
+    def _schedule(self, token, expires_at):
+        # One heap entry per token: renewals only move the entry when it pops,
+        # so the heap grows with the number of rooms rather than with writes.
+        queued_at = self._queued.get(token)
+        if queued_at is None or expires_at < queued_at:
+            self._queued[token] = expires_at
+            heapq.heappush(self._heap, (expires_at, token))
+
+    def touch(self, token, expires_at, member_ids):
+        with self._lock:
+            self._entries[token] = (expires_at, list(member_ids))
+            self._removed.discard(token)
+            self._schedule(token, expires_at)
+
+    def discard(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+            self._removed.add(token)
+
+    def pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                queued_at, token = heapq.heappop(self._heap)
+                if self._queued.get(token) != queued_at:
+                    continue
+                del self._queued[token]
+                entry = self._entries.get(token)
+                if entry is None:
+                    continue
+                if entry[0] > queued_at:
+                    self._schedule(token, entry[0])
+                    continue
+                del self._entries[token]
+                expired.append((token, entry[1]))
+        return expired
+
+    def entries(self):
+        with self._lock:
+            return dict(self._entries)
+
+    def sync(self):
+        # Other workers index the rooms they write, so merge their entries
+        # before persisting ours, under the same lock as their merges.
+        with self.lock(ROOM_EXPIRY_INDEX_KEY):
+            stored = self.cachelib.get(ROOM_EXPIRY_INDEX_KEY) or {}
+            with self._lock:
+                for token, (expires_at, member_ids) in stored.items():
+                    current = self._entries.get(token)
+                    if token in self._removed or (current is not None and current[0] >= expires_at):
+                        continue
+                    self._entries[token] = (expires_at, member_ids)
+                    self._schedule(token, expires_at)
+                self._removed.clear()
+                snapshot = dict(self._entries)
+            # Every indexed room expires within one TTL of now, and a sweep
+            # rewrites the index well before then.
+            self.cachelib.set(ROOM_EXPIRY_INDEX_KEY, snapshot, timeout=self.ttl_seconds)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._heap.clear()
+            self._queued.clear()
+            self._removed.clear()
+        self.cachelib.delete(ROOM_EXPIRY_INDEX_KEY)
+
+
 class RoomStore:
-    def __init__(self, *, cachelib=None, redis_client=None, ttl_seconds=7 * 24 * 60 * 60):
+    def __init__(
+        self,
+        *,
+        cachelib=None,
+        redis_client=None,
+        ttl_seconds=7 * 24 * 60 * 60,
+        compression=None,
+        compression_threshold=ROOM_COMPRESSION_THRESHOLD,
+        events=None,
+        lock_dir=None,
+    ):
         self.cachelib = cachelib
         self.redis_client = redis_client
         self.ttl_seconds = ttl_seconds
+        self.compression = resolve_compression(compression)
+        self.compression_threshold = compression_threshold
+        self.events = events
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._local_locks = [threading.Lock() for _ in range(ROOM_LOCK_STRIPES)]
+        self.expiry_index = (
+            RoomExpiryIndex(cachelib, ttl_seconds=ttl_seconds, lock=self._write_lock)
+            if redis_client is None and cachelib is not None
+            else None
+        )
+
+    @property
+    def needs_sweeping(self):
+        return self.expiry_index is not None
+
+    def _publish(self, token, event):
+        if self.events is None:
+            return
+        try:
+            self.events.publish(token, event)
+        except Exception:  # pragma: no cover - a lost notification must not fail the write
+            logger.exception("Could not publish room event for %s.", token)
+
+    def _encode(self, value):
+        return encode_blob(
+            value,
+            compression=self.compression,
+            threshold=self.compression_threshold,
+        )
 
     def _key(self, token):
         return f"sato:room:{token}"
 
-    def _generate_token(self):
-        while True:
-            token = secrets.token_urlsafe(ROOM_TOKEN_BYTES)
-            if not self.get_room(token):
-                return token
+    def _tracks_key(self, token):
+        return f"{self._key(token)}:tracks"
+
+    def _refs_key(self, token, member_id=None):
+        if member_id is None:
+            return f"{self._key(token)}:refs"
+        return f"{self._key(token)}:refs:{member_id}"
+
+    def _preview_key(self, token):
+        return f"{self._key(token)}:preview"
+
+    @contextmanager
+    def _write_lock(self, name):
+        # cachelib has no compare-and-set, so cachelib writes run under a lock.
+        # The lock file makes it hold across workers on one host; without a
+        # lock directory the cachelib store supports a single worker process,
+        # and multi-worker deployments belong on Redis or SQLite.
+        stripe = zlib.crc32(name.encode()) % ROOM_LOCK_STRIPES
+        with self._local_locks[stripe]:
+            if not self.lock_dir:
+                yield
+                return
+            with open(os.path.join(self.lock_dir, f"{stripe}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stored_version(self, header):
+        return (header or {}).get("version", 0)
+
+    def _split_room(self, room):
+        header = {key: value for key, value in room.items() if key != "track_table"}
+        header["contributions"] = {}
+        track_refs = {}
+        for member_id, contribution in room["contributions"].items():
+            header["contributions"][member_id] = {
+                key: value for key, value in contribution.items() if key != "track_refs"
+            }
+            if "track_refs" in contribution:
+                track_refs[member_id] = contribution["track_refs"]
+        return header, room.get("track_table"), track_refs
+
+    def _attach_tracks(self, room, track_table, track_refs):
+        contributions = room["contributions"]
+        if track_table is None:
+            # Pre-table rooms keep their tracks inline and are migrated on write.
+            if all("tracks" in contribution for contribution in contributions.values()):
+                return room
+            raise RoomDataLostError(room["token"])
+        # A header whose track data is gone must not load as a room that
+        # quietly lost members.
+        if any(member_id not in track_refs for member_id in contributions):
+            raise RoomDataLostError(room["token"])
+        room["track_table"] = track_table
+        for member_id, contribution in contributions.items():
+            contribution["track_refs"] = track_refs[member_id]
+        return room
 
-    def get_room(self, token):
+    def get_room(self, token, *, include_tracks=False):
         if not token:
             return None
 
@@ -37,36 +243,272 @@ class RoomStore:
             raw_value = self.redis_client.get(key)
             if raw_value is None:
                 return None
-            return json.loads(raw_value)
+            room = decode_blob(raw_value)
+            if not include_tracks or "track_table" in room:
+                return room
+
+            pipeline = self.redis_client.pipeline()
+            pipeline.get(self._tracks_key(token))
+            pipeline.hgetall(self._refs_key(token))
+            raw_table, raw_refs = pipeline.execute()
+            return self._attach_tracks(
+                room,
+                decode_blob(raw_table) if raw_table is not None else None,
+                {
+                    (member_id.decode() if isinstance(member_id, bytes) else member_id): decode_blob(refs)
+                    for member_id, refs in (raw_refs or {}).items()
+                },
+            )
 
         if self.cachelib is None:
             return None
 
         room = self.cachelib.get(key)
-        return deepcopy(room) if room else None
+        if not room:
+            return None
+        if not include_tracks or "track_table" in room:
+            return room
+
+        track_refs = {}
+        for member_id in room["contributions"]:
+            refs = self.cachelib.get(self._refs_key(token, member_id))
+            if refs is not None:
+                track_refs[member_id] = refs
+        track_table = self.cachelib.get(self._tracks_key(token))
+        return self._attach_tracks(
+            room,
+            decode_blob(track_table) if isinstance(track_table, bytes) else track_table,
+            track_refs,
+        )
 
     def save_room(self, room):
+        return self._write_room(room, tracks="track_table" in room)
+
+    def save_header(self, room):
+        return self._write_room(room, tracks=False)
+
+    def set_weights(self, room, weights):
+        room["weights"] = weights
+        return self.save_header(room)
+
+    def put_contribution(self, room, member_id, *, refs_remapped=False):
+        return self._write_room(room, tracks=True, members=None if refs_remapped else [member_id])
+
+    def _write_room(self, room, *, tracks, members=None, create=False):
         token = room["token"]
+        expected_version = room.get("version", 0)
+        next_version = expected_version + 1
+        # Both backends serialize on write and deserialize on read, so the
+        # stored room never aliases the caller's dicts and nothing is copied here.
+        header, track_table, track_refs = self._split_room(room)
+        header["version"] = next_version
+        if not tracks:
+            track_table = None
+        elif track_table is None:
+            raise ValueError("Load the room with include_tracks=True before writing track data.")
+
+        self._store_room(
+            token,
+            expected_version,
+            header,
+            track_table,
+            track_refs,
+            members,
+            create=create,
+        )
+        room["version"] = next_version
+        self._publish(token, {"version": next_version})
+        return room
+
+    def _store_room(
+        self,
+        token,
+        expected_version,
+        header,
+        track_table,
+        track_refs,
+        members,
+        *,
+        create=False,
+    ):
         key = self._key(token)
-        room_copy = deepcopy(room)
+        if self.redis_client is not None and create:
+            # SET NX claims the token in the same round trip that stores the header.
+            if not self.redis_client.set(key, self._encode(header), nx=True, ex=self.ttl_seconds):
+                raise RoomConflictError(token)
+            pipeline = self.redis_client.pipeline()
+            self._queue_redis_track_writes(pipeline, token, track_table, track_refs, members)
+            pipeline.execute()
+        elif self.redis_client is not None:
+            with self.redis_client.pipeline() as pipeline:
+                try:
+                    pipeline.watch(key)
+                    raw_value = pipeline.get(key)
+                    stored = decode_blob(raw_value) if raw_value is not None else None
+                    if self._stored_version(stored) != expected_version:
+                        raise RoomConflictError(token)
+                    pipeline.multi()
+                    self._queue_redis_writes(pipeline, token, header, track_table, track_refs, members)
+                    pipeline.execute()
+                except WatchError:
+                    raise RoomConflictError(token) from None
+        elif self.cachelib is not None:
+            with self._write_lock(token):
+                self._store_cached_room(
+                    token,
+                    expected_version,
+                    header,
+                    track_table,
+                    track_refs,
+                    members,
+                    create=create,
+                )
 
-        if self.redis_client is not None:
-            self.redis_client.setex(key, self.ttl_seconds, json.dumps(room_copy))
-            return room_copy
+    def _store_cached_room(
+        self,
+        token,
+        expected_version,
+        header,
+        track_table,
+        track_refs,
+        members,
+        *,
+        create=False,
+    ):
+        key = self._key(token)
+        if create:
+            if not self.cachelib.add(key, header, timeout=self.ttl_seconds):
+                raise RoomConflictError(token)
+            previous = None
+        else:
+            previous = self.cachelib.get(key)
+            if self._stored_version(previous) != expected_version:
+                raise RoomConflictError(token)
+        written = set()
+        if track_table is not None:
+            self.cachelib.set(
+                self._tracks_key(token),
+                self._encode(track_table),
+                timeout=self.ttl_seconds,
+            )
+            if members is None:
+                members = set(track_refs) | set((previous or {}).get("contributions", {}))
+            for member_id in members:
+                if member_id in track_refs:
+                    self.cachelib.set(
+                        self._refs_key(token, member_id),
+                        track_refs[member_id],
+                        timeout=self.ttl_seconds,
+                    )
+                else:
+                    self.cachelib.delete(self._refs_key(token, member_id))
+            written = {None, *members}
+        if not create:
+            # Track data shares the header's TTL, so every write renews the
+            # keys it did not rewrite to keep them from expiring first.
+            self._renew_cached_tracks(token, header["contributions"], written)
+            self.cachelib.set(key, header, timeout=self.ttl_seconds)
+        self.expiry_index.touch(token, time.time() + self.ttl_seconds, header["contributions"])
 
-        if self.cachelib is not None:
-            self.cachelib.set(key, room_copy, timeout=self.ttl_seconds)
+    def _renew_cached_tracks(self, token, member_ids, written):
+        keys = [
+            self._refs_key(token, member_id) for member_id in member_ids if member_id not in written
+        ]
+        if None not in written:
+            keys.append(self._tracks_key(token))
+        for key in keys:
+            value = self.cachelib.get(key)
+            if value is not None:
+                self.cachelib.set(key, value, timeout=self.ttl_seconds)
 
-        return room_copy
+    def _queue_redis_writes(self, pipeline, token, header, track_table, track_refs, members):
+        self._queue_redis_track_writes(pipeline, token, track_table, track_refs, members)
+        pipeline.setex(self._key(token), self.ttl_seconds, self._encode(header))
+
+    def _queue_redis_track_writes(self, pipeline, token, track_table, track_refs, members):
+        refs_key = self._refs_key(token)
+        if track_table is not None:
+            pipeline.setex(self._tracks_key(token), self.ttl_seconds, self._encode(track_table))
+            if members is None:
+                pipeline.delete(refs_key)
+                members = track_refs
+            changed_refs = {
+                member_id: dumps(track_refs[member_id])
+                for member_id in members
+                if member_id in track_refs
+            }
+            removed_members = [member_id for member_id in members if member_id not in track_refs]
+            if changed_refs:
+                pipeline.hset(refs_key, mapping=changed_refs)
+            if removed_members:
+                pipeline.hdel(refs_key, *removed_members)
+        pipeline.expire(self._tracks_key(token), self.ttl_seconds)
+        pipeline.expire(refs_key, self.ttl_seconds)
 
     def delete_room(self, token):
         key = self._key(token)
         if self.redis_client is not None:
-            self.redis_client.delete(key)
-            return
+            self.redis_client.delete(
+                key,
+                self._tracks_key(token),
+                self._refs_key(token),
+                self._preview_key(token),
+            )
+        elif self.cachelib is not None:
+            room = self.cachelib.get(key) or {}
+            self._delete_cached_room(token, room.get("contributions", {}))
+            self.expiry_index.discard(token)
+        self._publish(token, {"deleted": True})
 
-        if self.cachelib is not None:
-            self.cachelib.delete(key)
+    def _delete_cached_room(self, token, member_ids):
+        for member_id in member_ids:
+            self.cachelib.delete(self._refs_key(token, member_id))
+        self.cachelib.delete(self._tracks_key(token))
+        self.cachelib.delete(self._preview_key(token))
+        self.cachelib.delete(self._key(token))
+
+    def get_preview(self, token, preview_key):
+        if self.redis_client is not None:
+            raw_value = self.redis_client.get(self._preview_key(token))
+            entry = decode_blob(raw_value) if raw_value is not None else None
+        elif self.cachelib is not None:
+            entry = self.cachelib.get(self._preview_key(token))
+        else:
+            entry = None
+        if not entry or entry.get("key") != preview_key:
+            return None
+        return entry["preview"]
+
+    def put_preview(self, token, preview_key, preview):
+        # One slot per room: a newer preview simply replaces the last one.
+        entry = {"key": preview_key, "preview": preview}
+        if self.redis_client is not None:
+            self.redis_client.setex(self._preview_key(token), self.ttl_seconds, self._encode(entry))
+        elif self.cachelib is not None:
+            self.cachelib.set(self._preview_key(token), entry, timeout=self.ttl_seconds)
+        return preview
+
+    def sweep_expired(self, now=None):
+        # Redis expires room keys on its own.
+        if self.expiry_index is None:
+            return 0
+
+        now = time.time() if now is None else now
+        swept = 0
+        for token, member_ids in self.expiry_index.pop_expired(now):
+            header = self.cachelib.get(self._key(token))
+            if header is not None:
+                # Another worker renewed the room after this entry was indexed.
+                self.expiry_index.touch(
+                    token,
+                    _expires_at_timestamp(header, now + self.ttl_seconds),
+                    header["contributions"],
+                )
+                continue
+            self._delete_cached_room(token, member_ids)
+            swept += 1
+        self.expiry_index.sync()
+        return swept
 
     def clear(self):
         if self.redis_client is not None:
@@ -75,16 +517,19 @@ class RoomStore:
             return
 
         if self.cachelib is not None:
-            self.cachelib.clear()
+            self.expiry_index.sync()
+            for token, (_, member_ids) in self.expiry_index.entries().items():
+                self._delete_cached_room(token, member_ids)
+            self.expiry_index.reset()
 
     def create_room(self, *, host_user_id, playlist_name):
-        token = self._generate_token()
         timestamp = utc_now_iso()
         expires_at = (
             datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
         ).replace(microsecond=0).isoformat().replace("+00:00", "Z")
         room = {
-            "token": token,
+            "token": None,
+            "version": 0,
             "host_user_id": host_user_id,
             "playlist_name": playlist_name,
             "created_at": timestamp,
@@ -92,8 +537,42 @@ class RoomStore:
             "expires_at": expires_at,
             "members": [],
             "contributions": {},
+            "track_table": empty_track_table(),
             "weights": {},
             "final_playlist": None,
             "wrapped": None,
         }
-        return self.save_room(room)
+        # Tokens are claimed by the create write itself, so there is no lookup
+        # first and no window between checking a token and storing the room.
+        while True:
+            room["token"] = secrets.token_urlsafe(ROOM_TOKEN_BYTES)
+            try:
+                return self._write_room(room, tracks=True, create=True)
+            except RoomConflictError:
+                continue
+
+
+def _expires_at_timestamp(room, default):
+    try:
+        return datetime.fromisoformat(room["expires_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def start_room_sweeper(room_store, *, interval_seconds=ROOM_SWEEP_INTERVAL_SECONDS):
+    stop = threading.Event()
+    if not room_store.needs_sweeping or interval_seconds <= 0:
+        return stop
+
+    def run():
+        while not stop.wait(interval_seconds):
+            try:
+                swept = room_store.sweep_expired()
+            except Exception:  # pragma: no cover - keep sweeping after transient cache errors
+                logger.exception("Room sweep failed.")
+                continue
+            if swept:
+                logger.info("Swept %s expired rooms.", swept)
+
+    threading.Thread(target=run, name="sato-room-sweeper", daemon=True).start()
+    return stop
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import copy
+import threading
 import time
-from urllib.parse import urlencode
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from fetch_pool import SourceFetcher
+from rate_limiter import default_scheduler, parse_retry_after
+
+
+DEFAULT_HTTP_POOL_SIZE = 20
+DEFAULT_HTTP_CONNECT_RETRIES = 2
 
 
 class SpotifyAPIError(Exception):
@@ -21,6 +34,82 @@ def _safe_json(response):
         return {}
 
 
+def _with_query(path, **params):
+    parts = urlsplit(path)
+    query = dict(parse_qsl(parts.query))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def build_http_session(
+    *,
+    pool_size=DEFAULT_HTTP_POOL_SIZE,
+    connect_retries=DEFAULT_HTTP_CONNECT_RETRIES,
+):
+    # The session is shared by every user, so it never keeps cookies and auth
+    # headers are passed on each request instead.
+    http_session = requests.Session()
+    http_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(
+        # One pool each for api.spotify.com and accounts.spotify.com.
+        pool_connections=2,
+        pool_maxsize=pool_size,
+        # Only failed connects are retried here: the request never left, so it is
+        # safe even for POSTs. 429s go through the RequestScheduler.
+        max_retries=Retry(
+            total=connect_retries,
+            connect=connect_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=0.1,
+        ),
+    )
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    return http_session
+
+
+class ETagStore:
+    def __init__(self, *, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def set(self, url, etag, payload):
+        with self._lock:
+            self._entries[url] = (etag, payload)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ETagStoreRegistry:
+    def __init__(self, *, max_users=256, max_entries_per_user=32):
+        self.max_users = max_users
+        self.max_entries_per_user = max_entries_per_user
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_user(self, user_id):
+        with self._lock:
+            store = self._stores.get(user_id)
+            if store is None:
+                store = ETagStore(max_entries=self.max_entries_per_user)
+                self._stores[user_id] = store
+            self._stores.move_to_end(user_id)
+            while len(self._stores) > self.max_users:
+                self._stores.popitem(last=False)
+            return store
+
+
 class SpotifyClient:
     API_BASE = "https://api.spotify.com/v1"
     AUTH_URL = "https://accounts.spotify.com/authorize"
@@ -47,6 +136,9 @@ class SpotifyClient:
         token_updater=None,
         timeout=15,
         http_session=None,
+        page_fanout=1,
+        scheduler=None,
+        etag_store=None,
     ):
         self.client_id = client_id
         self.client_secret = client_secret
@@ -57,6 +149,9 @@ class SpotifyClient:
         self.token_updater = token_updater
         self.timeout = timeout
         self.http_session = http_session or requests.Session()
+        self.page_fanout = max(1, int(page_fanout or 1))
+        self.scheduler = scheduler if scheduler is not None else default_scheduler
+        self.etag_store = etag_store
 
     def authorization_url(self, state):
         params = {
@@ -157,14 +252,27 @@ class SpotifyClient:
         url = path if path.startswith("http") else f"{self.API_BASE}{path}"
         headers = kwargs.pop("headers", {})
         headers["Authorization"] = f"Bearer {self.access_token}"
-
-        response = self.http_session.request(
-            method,
-            url,
-            headers=headers,
-            timeout=self.timeout,
-            **kwargs,
-        )
+        cached_entry = None
+        if method == "GET" and self.etag_store is not None:
+            cached_entry = self.etag_store.get(url)
+            if cached_entry is not None:
+                headers["If-None-Match"] = cached_entry[0]
+
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            response = self.http_session.request(
+                method,
+                url,
+                headers=headers,
+                timeout=self.timeout,
+                **kwargs,
+            )
+            if response.status_code != 429:
+                break
+            if self.scheduler.backoff(attempt, parse_retry_after(response)) is None:
+                break
+            attempt += 1
 
         if response.status_code == 401 and retry_on_unauthorized and self.refresh_token:
             self.refresh_access_token()
@@ -182,15 +290,64 @@ class SpotifyClient:
                 payload=_safe_json(response),
             )
 
+        # Callers get their own copy so editing a response never touches the cache.
+        if response.status_code == 304 and cached_entry is not None:
+            return copy.deepcopy(cached_entry[1])
+
         if response.status_code == 204 or not response.content:
             return None
 
-        return response.json()
+        payload = response.json()
+        etag = (getattr(response, "headers", None) or {}).get("ETag")
+        if method == "GET" and etag and self.etag_store is not None:
+            self.etag_store.set(url, etag, copy.deepcopy(payload))
+        return payload
 
-    def _paginate(self, path, *, item_limit=None):
-        items = []
-        next_path = path
-        while next_path:
+    def _paginate(self, path, *, item_limit=None, parallel=False):
+        if parallel and self.page_fanout > 1:
+            return self._paginate_by_offset(path, item_limit=item_limit)
+        return self._follow_pages([], path, item_limit=item_limit)
+
+    def _paginate_by_offset(self, path, *, item_limit=None):
+        payload = self._request("GET", path)
+        items = list(payload.get("items", []))
+        total = payload.get("total")
+        page_size = payload.get("limit") or len(items)
+        if not isinstance(total, int) or not page_size:
+            if item_limit is not None:
+                items = items[:item_limit]
+            return self._follow_pages(items, payload.get("next"), item_limit=item_limit)
+
+        first_offset = int(payload.get("offset") or 0)
+        wanted = total - first_offset
+        if item_limit is not None:
+            wanted = min(wanted, item_limit)
+        if len(items) >= wanted or not payload.get("next"):
+            return items[:wanted] if item_limit is not None else items
+
+        # Pages after the first reuse the token the first request validated, so a
+        # 401 here surfaces instead of refreshing from a worker thread.
+        page_paths = [
+            _with_query(path, offset=offset, limit=page_size)
+            for offset in range(first_offset + page_size, first_offset + wanted, page_size)
+        ]
+        fetcher = SourceFetcher(max_workers=self.page_fanout)
+        pages = fetcher.run(
+            [
+                lambda page_path=page_path: self._request(
+                    "GET",
+                    page_path,
+                    retry_on_unauthorized=False,
+                )
+                for page_path in page_paths
+            ]
+        )
+        for page in pages:
+            items.extend(page.get("items", []))
+        return items[:wanted] if item_limit is not None else items
+
+    def _follow_pages(self, items, next_path, *, item_limit=None):
+        while next_path and (item_limit is None or len(items) < item_limit):
             payload = self._request("GET", next_path)
             page_items = payload.get("items", [])
             if item_limit is not None:
@@ -212,7 +369,7 @@ class SpotifyClient:
         return self._request("GET", f"/me/top/tracks?limit={limit}").get("items", [])
 
     def get_saved_tracks(self, limit=500):
-        return self._paginate("/me/tracks?limit=50", item_limit=limit)
+        return self._paginate("/me/tracks?limit=50", item_limit=limit, parallel=True)
 
     def get_saved_tracks_total(self, limit_cap=500):
         payload = self._request("GET", "/me/tracks?limit=1")
@@ -224,12 +381,18 @@ class SpotifyClient:
         )
 
     def get_current_user_playlists(self, limit=200):
-        return self._paginate("/me/playlists?limit=50", item_limit=limit)
+        return self._paginate("/me/playlists?limit=50", item_limit=limit, parallel=True)
+
+    def get_playlist_snapshot_id(self, playlist_id):
+        return self._request("GET", f"/playlists/{playlist_id}?fields=snapshot_id").get(
+            "snapshot_id"
+        )
 
     def get_playlist_tracks(self, playlist_id, limit=500):
         return self._paginate(
             f"/playlists/{playlist_id}/tracks?limit=100",
             item_limit=limit,
+            parallel=True,
         )
 
     def create_playlist(self, user_id, name, description, is_public=False):
@@ -279,11 +442,13 @@ class SpotifyClient:
         if not track_uris:
             return None
 
+        payload = None
         for start in range(0, len(track_uris), 100):
-            self._request(
+            payload = self._request(
                 "POST",
                 f"/playlists/{playlist_id}/tracks",
                 json={"uris": track_uris[start : start + 100]},
             )
 
-        return {"snapshot_id": "snapshot"}
+        # Each batch returns the playlist snapshot it produced; the last one is current.
+        return {"snapshot_id": (payload or {}).get("snapshot_id")}
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from codec import decode_blob, dumps
+from room_store import RoomConflictError, RoomStore
+
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rooms (
+        token TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        header BLOB NOT NULL,
+        track_table BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS rooms_expires_at ON rooms (expires_at)",
+    """
+    CREATE TABLE IF NOT EXISTS contributions (
+        token TEXT NOT NULL REFERENCES rooms (token) ON DELETE CASCADE,
+        member_id TEXT NOT NULL,
+        track_refs BLOB NOT NULL,
+        PRIMARY KEY (token, member_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS previews (
+        token TEXT PRIMARY KEY REFERENCES rooms (token) ON DELETE CASCADE,
+        preview_key TEXT NOT NULL,
+        preview BLOB NOT NULL
+    )
+    """,
+)
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# keeps them prepared across requests.
+SELECT_ROOM = "SELECT header, track_table FROM rooms WHERE token = ? AND expires_at > ?"
+SELECT_HEADER = "SELECT header FROM rooms WHERE token = ? AND expires_at > ?"
+SELECT_REFS = "SELECT member_id, track_refs FROM contributions WHERE token = ?"
+UPDATE_ROOM = """
+    UPDATE rooms
+    SET version = ?, expires_at = ?, header = ?, track_table = COALESCE(?, track_table)
+    WHERE token = ? AND version = ? AND expires_at > ?
+"""
+INSERT_ROOM = """
+    INSERT INTO rooms (token, version, expires_at, header, track_table)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (token) DO NOTHING
+"""
+DELETE_EXPIRED_ROOM = "DELETE FROM rooms WHERE token = ? AND expires_at <= ?"
+UPSERT_REFS = """
+    INSERT INTO contributions (token, member_id, track_refs)
+    VALUES (?, ?, ?)
+    ON CONFLICT (token, member_id) DO UPDATE SET track_refs = excluded.track_refs
+"""
+DELETE_REFS = "DELETE FROM contributions WHERE token = ? AND member_id = ?"
+DELETE_ALL_REFS = "DELETE FROM contributions WHERE token = ?"
+SELECT_PREVIEW = "SELECT preview FROM previews WHERE token = ? AND preview_key = ?"
+UPSERT_PREVIEW = """
+    INSERT INTO previews (token, preview_key, preview)
+    SELECT token, ?, ? FROM rooms WHERE token = ?
+    ON CONFLICT (token) DO UPDATE SET preview_key = excluded.preview_key, preview = excluded.preview
+"""
+DELETE_ROOM = "DELETE FROM rooms WHERE token = ?"
+SWEEP_ROOMS = "DELETE FROM rooms WHERE expires_at <= ?"
+
+
+class SqliteRoomStore(RoomStore):
+    def __init__(self, path, *, busy_timeout_seconds=5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = str(path)
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._local = threading.local()
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    @property
+    def needs_sweeping(self):
+        return True
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode, so every write opens its own BEGIN IMMEDIATE.
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_seconds,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def get_room(self, token, *, include_tracks=False):
+        if not token:
+            return None
+
+        connection = self._connection()
+        if not include_tracks:
+            row = connection.execute(SELECT_HEADER, (token, time.time())).fetchone()
+            return decode_blob(row[0]) if row else None
+
+        row = connection.execute(SELECT_ROOM, (token, time.time())).fetchone()
+        if not row:
+            return None
+        track_refs = {
+            member_id: decode_blob(refs)
+            for member_id, refs in connection.execute(SELECT_REFS, (token,))
+        }
+        return self._attach_tracks(
+            decode_blob(row[0]),
+            decode_blob(row[1]) if row[1] is not None else None,
+            track_refs,
+        )
+
+    def _store_room(
+        self,
+        token,
+        expected_version,
+        header,
+        track_table,
+        track_refs,
+        members,
+        *,
+        create=False,
+    ):
+        now = time.time()
+        encoded_table = self._encode(track_table) if track_table is not None else None
+        with self._transaction() as connection:
+            if create:
+                connection.execute(DELETE_EXPIRED_ROOM, (token, now))
+                cursor = connection.execute(
+                    INSERT_ROOM,
+                    (token, header["version"], now + self.ttl_seconds, self._encode(header), encoded_table),
+                )
+            else:
+                cursor = connection.execute(
+                    UPDATE_ROOM,
+                    (
+                        header["version"],
+                        now + self.ttl_seconds,
+                        self._encode(header),
+                        encoded_table,
+                        token,
+                        expected_version,
+                        now,
+                    ),
+                )
+            if cursor.rowcount != 1:
+                raise RoomConflictError(token)
+
+            if track_table is None:
+                return
+            if members is None:
+                connection.execute(DELETE_ALL_REFS, (token,))
+                members = track_refs
+            for member_id in members:
+                if member_id in track_refs:
+                    connection.execute(UPSERT_REFS, (token, member_id, dumps(track_refs[member_id])))
+                else:
+                    connection.execute(DELETE_REFS, (token, member_id))
+
+    def get_preview(self, token, preview_key):
+        row = self._connection().execute(SELECT_PREVIEW, (token, preview_key)).fetchone()
+        return decode_blob(row[0]) if row else None
+
+    def put_preview(self, token, preview_key, preview):
+        with self._transaction() as connection:
+            connection.execute(UPSERT_PREVIEW, (preview_key, self._encode(preview), token))
+        return preview
+
+    def delete_room(self, token):
+        with self._transaction() as connection:
+            connection.execute(DELETE_ROOM, (token,))
+        self._publish(token, {"deleted": True})
+
+    def sweep_expired(self, now=None):
+        with self._transaction() as connection:
+            return connection.execute(SWEEP_ROOMS, (time.time() if now is None else now,)).rowcount
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM rooms")
@@ -1,8 +1,13 @@
+import queue
+import threading
 from urllib.parse import parse_qs, urlparse
 
 import pytest
+from cachelib.simple import SimpleCache
 
+import app as app_module
 from app import create_app
+from sqlite_room_store import SqliteRoomStore
 from spotify_client import SpotifyAPIError
 
 
@@ -122,6 +127,9 @@ class FakeSpotifyService:
                 {"track": make_track("shared-track", "Shared Track", "Shared Artist")},
             ],
         }
+        self.profile_fetches = 0
+        self.playlist_snapshots = {}
+        self.playlist_track_fetches = []
         self.created_playlists = []
         self.added_tracks = []
         self.exchanged_codes = []
@@ -171,6 +179,7 @@ class FakeSpotifyService:
         }
 
     def get_current_user(self):
+        self.profile_fetches += 1
         return self.current_user
 
     def get_current_user_top_tracks(self, limit=50):
@@ -188,7 +197,11 @@ class FakeSpotifyService:
     def get_current_user_playlists(self, limit=200):
         return self.current_user_playlists[self.current_user["id"]][:limit]
 
+    def get_playlist_snapshot_id(self, playlist_id):
+        return self.playlist_snapshots.get(playlist_id, f"{playlist_id}-snapshot")
+
     def get_playlist_tracks(self, playlist_id, limit=500):
+        self.playlist_track_fetches.append(playlist_id)
         return self.playlist_tracks[playlist_id][:limit]
 
     def create_playlist(self, user_id, name, description, is_public=False):
@@ -225,17 +238,31 @@ def fake_spotify():
     return service
 
 
-@pytest.fixture
-def client(fake_spotify):
+def make_app(fake_spotify, tmp_path, **config):
     app = create_app(
         {
             "TESTING": True,
             "CLIENT_APP_URL": "http://localhost:5173",
             "SPOTIFY_CLIENT_ID": "server-client-id",
             "SPOTIFY_CLIENT_SECRET": "server-client-secret",
+            "ROOM_SQLITE_PATH": str(tmp_path / "rooms.sqlite3"),
+            "ROOM_CACHELIB": SimpleCache(),
+            "ROOM_LOCK_DIR": str(tmp_path / "room-locks"),
+            "PLAYLIST_TRACK_CACHELIB": SimpleCache(),
+            "SOURCE_CATALOG_CACHELIB": SimpleCache(),
+            "SOURCE_RESULT_CACHELIB": SimpleCache(),
+            # The shared fake is not thread-safe, so warm-up is opted into per test.
+            "SOURCE_CATALOG_WARMUP": False,
+            **config,
         }
     )
     app.config["SPOTIFY_CLIENT_FACTORY"] = lambda **kwargs: fake_spotify.bind(**kwargs)
+    return app
+
+
+@pytest.fixture(params=["cache", "sqlite"])
+def client(request, fake_spotify, tmp_path):
+    app = make_app(fake_spotify, tmp_path, ROOM_STORE_BACKEND=request.param)
 
     with app.test_client() as test_client:
         yield test_client
@@ -285,6 +312,20 @@ def test_source_catalog_filters_to_owned_or_collaborative_playlists(client, fake
     assert [playlist["id"] for playlist in payload["playlists"]] == ["host-owned", "shared-collab"]
 
 
+def test_source_catalog_is_cached_server_side_not_in_the_session(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    first = client.get("/api/me/source-catalog").get_json()
+
+    fake_spotify.current_user_playlists["host"] = []
+    with client.session_transaction() as flask_session:
+        assert "source_catalog_cache" not in flask_session
+        flask_session.clear()
+    authenticate(client, fake_spotify, "host")
+
+    assert client.get("/api/me/source-catalog").get_json() == first
+    assert client.get("/api/me/source-catalog?refresh=1").get_json()["playlists"] == []
+
+
 def test_create_join_and_leave_room_flow(client, fake_spotify):
     authenticate(client, fake_spotify, "host")
     room_response = client.post("/api/rooms")
@@ -340,7 +381,7 @@ def test_saving_contributions_rebalances_weights_and_dedupes_tracks(client, fake
     assert weights == {"host": 50, "guest": 50}
 
 
-def test_host_can_preview_create_and_fetch_wrapped(client, fake_spotify):
+def prepare_blend_room(client, fake_spotify):
     authenticate(client, fake_spotify, "host")
     token = client.post("/api/rooms").get_json()["token"]
     client.put(
@@ -376,6 +417,11 @@ def test_host_can_preview_create_and_fetch_wrapped(client, fake_spotify):
         },
     )
     assert weights_response.status_code == 200
+    return token
+
+
+def test_host_can_preview_create_and_fetch_wrapped(client, fake_spotify):
+    token = prepare_blend_room(client, fake_spotify)
 
     preview_response = client.post(f"/api/rooms/{token}/preview")
     assert preview_response.status_code == 200
@@ -404,6 +450,231 @@ def test_host_can_preview_create_and_fetch_wrapped(client, fake_spotify):
     assert wrapped_response.get_json()["playlist_id"] == "playlist-123"
 
 
+def test_rooms_that_lost_their_track_data_answer_gone(fake_spotify, tmp_path):
+    app = make_app(fake_spotify, tmp_path)
+    client = app.test_client()
+    token = prepare_blend_room(client, fake_spotify)
+    app.config["ROOM_CACHELIB"].delete(f"sato:room:{token}:tracks")
+
+    response = client.post(f"/api/rooms/{token}/preview")
+    assert response.status_code == 410
+    assert response.get_json()["error"]["code"] == "room_data_lost"
+
+
+def test_previews_are_reused_until_the_blend_inputs_change(client, fake_spotify, monkeypatch):
+    token = prepare_blend_room(client, fake_spotify)
+    builds = []
+    build_preview = app_module.build_indexed_blend_preview
+    monkeypatch.setattr(
+        app_module,
+        "build_indexed_blend_preview",
+        lambda *args, **kwargs: builds.append(1) or build_preview(*args, **kwargs),
+    )
+
+    first = client.post(f"/api/rooms/{token}/preview").get_json()
+    assert client.post(f"/api/rooms/{token}/preview").get_json() == first
+    assert len(builds) == 1
+
+    client.patch(
+        f"/api/rooms/{token}/weights",
+        json={"members": [{"id": "host", "weight": 50}, {"id": "guest", "weight": 50}]},
+    )
+    assert client.post(f"/api/rooms/{token}/preview").get_json() != first
+    assert len(builds) == 2
+
+    create_payload = client.post(f"/api/rooms/{token}/create").get_json()
+    assert len(builds) == 2
+    assert create_payload["wrapped"]["cover_art"] == client.post(f"/api/rooms/{token}/preview").get_json()["cover_art"]
+
+
+def test_contribution_save_fails_fast_when_a_source_fetch_errors(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+
+    def failing_playlist_tracks(playlist_id, limit=500):
+        raise SpotifyAPIError("Spotify request failed.", status_code=500)
+
+    fake_spotify.get_playlist_tracks = failing_playlist_tracks
+    response = client.put(
+        f"/api/rooms/{token}/contribution",
+        json={
+            "use_top_tracks": True,
+            "use_saved_tracks": True,
+            "use_recent_tracks": True,
+            "playlist_ids": ["host-owned"],
+        },
+    )
+
+    assert response.status_code == 502
+    assert response.get_json()["error"]["code"] == "spotify_error"
+    room = client.get(f"/api/rooms/{token}").get_json()
+    assert room["members"][0]["has_contribution"] is False
+
+
+def test_shared_playlist_tracks_are_fetched_once_until_the_snapshot_changes(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+    contribution = {
+        "use_top_tracks": False,
+        "use_saved_tracks": False,
+        "use_recent_tracks": False,
+        "playlist_ids": ["shared-collab"],
+    }
+    client.put(f"/api/rooms/{token}/contribution", json=contribution)
+
+    authenticate(client, fake_spotify, "guest")
+    client.post(f"/api/rooms/{token}/join")
+    guest_response = client.put(f"/api/rooms/{token}/contribution", json=contribution)
+
+    assert guest_response.status_code == 200
+    assert guest_response.get_json()["contribution"]["track_count"] == 2
+    assert fake_spotify.playlist_track_fetches == ["shared-collab"]
+
+    fake_spotify.playlist_snapshots["shared-collab"] = "shared-collab-snapshot-2"
+    client.put(f"/api/rooms/{token}/contribution", json=contribution)
+
+    assert fake_spotify.playlist_track_fetches == ["shared-collab", "shared-collab"]
+
+
+def test_contribution_saves_only_fetch_added_or_stale_sources(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+    calls = []
+    for name in ("get_current_user_top_tracks", "get_saved_tracks", "get_recently_played"):
+        fetch = getattr(fake_spotify, name)
+        setattr(
+            fake_spotify,
+            name,
+            lambda limit=50, fetch=fetch, name=name: calls.append(name) or fetch(limit=limit),
+        )
+    contribution = {
+        "use_top_tracks": True,
+        "use_saved_tracks": True,
+        "use_recent_tracks": False,
+        "playlist_ids": ["host-owned"],
+    }
+    client.get("/api/me/source-catalog")
+    calls.clear()
+    client.put(f"/api/rooms/{token}/contribution", json=contribution)
+    assert sorted(calls) == ["get_current_user_top_tracks", "get_saved_tracks"]
+
+    calls.clear()
+    response = client.put(
+        f"/api/rooms/{token}/contribution",
+        json={**contribution, "use_recent_tracks": True, "playlist_ids": []},
+    )
+
+    assert calls == ["get_recently_played"]
+    assert fake_spotify.playlist_track_fetches == ["host-owned"]
+    assert response.get_json()["contribution"]["source_summary"]["recent_tracks_count"] == 1
+    assert response.get_json()["contribution"]["track_count"] == 4
+
+
+def test_room_polling_trusts_the_cached_profile_within_the_freshness_window(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+    fetches_after_create = fake_spotify.profile_fetches
+
+    for _ in range(3):
+        assert client.get(f"/api/rooms/{token}").status_code == 200
+
+    assert fetches_after_create == 1
+    assert fake_spotify.profile_fetches == 1
+
+    with client.session_transaction() as flask_session:
+        flask_session["spotify_user_fetched_at"] = 0
+
+    client.get(f"/api/rooms/{token}")
+    assert fake_spotify.profile_fetches == 2
+
+
+def test_room_event_stream_pushes_diffs_after_room_writes(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+
+    stream = client.get(f"/api/rooms/{token}/events", buffered=False)
+    assert stream.mimetype == "text/event-stream"
+    events = queue.Queue()
+    # A real server streams from its own thread, so read the events from one here too.
+    reader = threading.Thread(target=lambda: [events.put(chunk) for chunk in stream.response])
+    reader.start()
+    assert events.get(timeout=5).startswith(b"event: room\n")
+
+    client.patch(f"/api/rooms/{token}/settings", json={"playlist_name": "Road Trip"})
+    diff = events.get(timeout=5)
+    assert diff.startswith(b"event: room.diff\n")
+    assert b'"playlist_name":"Road Trip"' in diff
+    assert b'"members"' not in diff
+
+    client.post(f"/api/rooms/{token}/leave")
+    assert events.get(timeout=5).startswith(b"event: room.closed\n")
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+
+
+def test_room_event_stream_sees_writes_from_other_workers(fake_spotify, tmp_path):
+    app = make_app(
+        fake_spotify,
+        tmp_path,
+        ROOM_STORE_BACKEND="sqlite",
+        ROOM_EVENT_POLL_SECONDS=0.05,
+    )
+    client = app.test_client()
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+
+    stream = client.get(f"/api/rooms/{token}/events", buffered=False)
+    events = queue.Queue()
+    reader = threading.Thread(target=lambda: [events.put(chunk) for chunk in stream.response])
+    reader.start()
+    assert events.get(timeout=5).startswith(b"event: room\n")
+
+    # A second worker shares the database but not the in-process broker.
+    other_worker = SqliteRoomStore(str(tmp_path / "rooms.sqlite3"))
+    room = other_worker.get_room(token)
+    room["playlist_name"] = "Road Trip"
+    other_worker.save_header(room)
+    diff = events.get(timeout=5)
+    assert diff.startswith(b"event: room.diff\n")
+    assert b'"playlist_name":"Road Trip"' in diff
+
+    other_worker.delete_room(token)
+    assert events.get(timeout=5).startswith(b"event: room.closed\n")
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+
+
+def test_room_event_stream_releases_its_subscription_when_access_is_denied(client, fake_spotify):
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+
+    authenticate(client, fake_spotify, "guest")
+    assert client.get(f"/api/rooms/{token}/events").status_code == 403
+    assert client.get("/api/rooms/missing/events").status_code == 404
+
+    room_events = client.application.extensions["sato_room_events"]
+    assert room_events.subscriber_count(token) == 0
+    assert room_events.subscriber_count("missing") == 0
+
+
+def test_room_event_streams_are_capped_per_process(fake_spotify, tmp_path):
+    app = make_app(fake_spotify, tmp_path, ROOM_EVENT_MAX_STREAMS=1)
+    client = app.test_client()
+    authenticate(client, fake_spotify, "host")
+    token = client.post("/api/rooms").get_json()["token"]
+
+    stream = client.get(f"/api/rooms/{token}/events", buffered=False)
+    busy = client.get(f"/api/rooms/{token}/events")
+    assert busy.status_code == 503
+    assert busy.get_json()["error"]["code"] == "room_events_busy"
+
+    stream.close()
+    reopened = client.get(f"/api/rooms/{token}/events", buffered=False)
+    assert reopened.status_code == 200
+    reopened.close()
+    assert app.extensions["sato_room_events"].subscriber_count(token) == 0
+
+
 def test_non_host_cannot_save_weights(client, fake_spotify):
     authenticate(client, fake_spotify, "host")
     token = client.post("/api/rooms").get_json()["token"]
@@ -463,3 +734,55 @@ def test_callback_restores_room_query_after_login(client, fake_spotify):
 
     assert query["login"] == ["success"]
     assert query["room"] == ["test-room"]
+
+
+def test_login_callback_warms_the_source_catalog_in_the_background(fake_spotify, tmp_path):
+    app = make_app(fake_spotify, tmp_path, SOURCE_CATALOG_WARMUP=True)
+    release = threading.Event()
+    list_playlists = fake_spotify.get_current_user_playlists
+
+    def slow_playlists(limit=200):
+        assert release.wait(5)
+        return list_playlists(limit=limit)
+
+    fake_spotify.get_current_user_playlists = slow_playlists
+    client = app.test_client()
+    state = parse_qs(urlparse(client.get("/api/auth/login").headers["Location"]).query)["state"][0]
+
+    assert client.get(f"/api/auth/callback?code=abc&state={state}").status_code == 302
+    assert app.extensions["sato_catalog_warmer"].pending("host") is not None
+
+    release.set()
+    payload = client.get("/api/me/source-catalog").get_json()
+    assert [playlist["id"] for playlist in payload["playlists"]] == ["host-owned", "shared-collab"]
+
+    fake_spotify.current_user_playlists["host"] = []
+    assert client.get("/api/me/source-catalog").get_json() == payload
+
+
+def test_source_catalog_loads_inline_when_the_warm_up_fails(fake_spotify, tmp_path, caplog):
+    app = make_app(fake_spotify, tmp_path, SOURCE_CATALOG_WARMUP=True)
+    release = threading.Event()
+    calls = []
+    list_playlists = fake_spotify.get_current_user_playlists
+
+    def flaky_playlists(limit=200):
+        calls.append(limit)
+        if len(calls) == 1:
+            assert release.wait(5)
+            raise SpotifyAPIError("Spotify request failed.", status_code=503)
+        return list_playlists(limit=limit)
+
+    fake_spotify.get_current_user_playlists = flaky_playlists
+    client = app.test_client()
+    state = parse_qs(urlparse(client.get("/api/auth/login").headers["Location"]).query)["state"][0]
+    assert client.get(f"/api/auth/callback?code=abc&state={state}").status_code == 302
+
+    # Fail the warm-up only once the catalog request is already waiting on it.
+    threading.Timer(0.2, release.set).start()
+    with caplog.at_level("INFO", logger="sato"):
+        payload = client.get("/api/me/source-catalog").get_json()
+
+    assert [playlist["id"] for playlist in payload["playlists"]] == ["host-owned", "shared-collab"]
+    assert len(calls) == 2
+    assert "Source catalog warm-up for host failed (503)" in caplog.text
@@ -0,0 +1,264 @@
+import random
+
+import pytest
+from cachelib.simple import SimpleCache
+
+import blend_service
+from app import build_config
+from blend_service import (
+    add_to_track_table,
+    build_contribution_snapshot,
+    build_indexed_blend_preview,
+    build_room_blend_preview,
+    build_track_table,
+    compact_track_table,
+    normalize_track_snapshot,
+    remove_from_track_table,
+    resolve_blend_engine,
+    table_tracks,
+)
+from track_cache import SourceResultCache
+
+
+def make_tracks(prefix, count, shared=()):
+    raw_tracks = [
+        {
+            "id": f"{prefix}-{index}",
+            "name": f"{prefix.title()} Track {index % 7}",
+            "artists": [{"name": f"{prefix.title()} Artist"}],
+            "album": {"images": [{"url": f"https://images.test/{prefix}-{index}.png"}]},
+        }
+        for index in range(count)
+    ]
+    raw_tracks.extend(
+        {
+            "id": track_id,
+            "name": f"Shared {track_id}",
+            "artists": [{"name": "Shared Artist"}],
+            "album": {"images": []},
+        }
+        for track_id in shared
+    )
+    return normalize_track_snapshot(raw_tracks)
+
+
+def make_contributors(contributions, weights):
+    return [
+        {
+            "id": member_id,
+            "name": member_id.title(),
+            "weight": weights[member_id],
+            "tracks": contributions[member_id],
+        }
+        for member_id in contributions
+    ]
+
+
+def test_indexed_preview_matches_a_full_rebuild():
+    contributions = {
+        "host": make_tracks("host", 40, shared=("s1", "s2", "s3")),
+        "guest": make_tracks("guest", 30, shared=("s1", "s2")),
+        "ally": make_tracks("ally", 25, shared=("s2", "s3")),
+    }
+    weights = {"host": 33.34, "guest": 33.33, "ally": 33.33}
+    contributors = make_contributors(contributions, weights)
+    track_table = build_track_table({key: {"tracks": value} for key, value in contributions.items()})
+
+    assert build_indexed_blend_preview(track_table, contributors, limit=20) == build_room_blend_preview(
+        contributors, limit=20
+    )
+
+
+def test_incremental_track_table_updates_match_a_fresh_table():
+    host_tracks = make_tracks("host", 10, shared=("s1",))
+    guest_tracks = make_tracks("guest", 10, shared=("s1",))
+    replacement_tracks = make_tracks("guest-next", 5, shared=("s1", "s9"))
+
+    track_table = build_track_table({})
+    contributions = {
+        "host": {"track_refs": add_to_track_table(track_table, "host", host_tracks)},
+        "guest": {"track_refs": add_to_track_table(track_table, "guest", guest_tracks)},
+    }
+    remove_from_track_table(track_table, "guest", contributions["guest"]["track_refs"])
+    contributions["guest"]["track_refs"] = add_to_track_table(track_table, "guest", replacement_tracks)
+    track_table = compact_track_table(track_table, contributions)
+
+    assert table_tracks(track_table, contributions["host"]["track_refs"]) == host_tracks
+    assert table_tracks(track_table, contributions["guest"]["track_refs"]) == replacement_tracks
+    assert sum(1 for members in track_table["members"] if members) == 17
+    assert track_table["members"][track_table["ids"].index("s1")] == ["host", "guest"]
+
+
+def test_track_table_is_compacted_once_most_rows_are_unreferenced():
+    track_table = build_track_table({})
+    contributions = {
+        "host": {"track_refs": add_to_track_table(track_table, "host", make_tracks("host", 4))},
+        "guest": {"track_refs": add_to_track_table(track_table, "guest", make_tracks("guest", 6))},
+    }
+
+    remove_from_track_table(track_table, "guest", contributions.pop("guest")["track_refs"])
+    track_table = compact_track_table(track_table, contributions)
+
+    assert track_table["ids"] == [track["id"] for track in make_tracks("host", 4)]
+    assert contributions["host"]["track_refs"] == [0, 1, 2, 3]
+
+
+def test_indexed_preview_matches_a_full_rebuild_for_six_large_contributions():
+    contributions = {
+        f"member-{index}": make_tracks(f"member-{index}", 1600, shared=[f"s{n}" for n in range(200)])
+        for index in range(6)
+    }
+    weights = {member_id: 100 / 6 for member_id in contributions}
+    contributors = make_contributors(contributions, weights)
+    track_table = build_track_table({key: {"tracks": value} for key, value in contributions.items()})
+
+    full_preview = build_room_blend_preview(contributors, limit=50)
+    indexed_preview = build_indexed_blend_preview(track_table, contributors, limit=50)
+
+    assert indexed_preview == full_preview
+    assert len(full_preview["tracks"]) == 50
+    assert full_preview["summary"]["total_tracks"] == 6 * 1600 + 200
+    assert all(track["overlap_count"] == 6 for track in full_preview["tracks"])
+
+
+def test_numpy_engine_matches_the_python_engine():
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    pool = [
+        {
+            "id": f"track-{index}",
+            "name": f"{rng.choice(['Alpha', 'alpha', 'Beta'])} {index % 5}",
+            "artists": ["Artist"],
+            "image": None,
+        }
+        for index in range(400)
+    ]
+    contributions = {
+        f"member-{index}": normalize_track_snapshot(rng.sample(pool, rng.randint(20, 250)))
+        for index in range(6)
+    }
+    weights = dict(zip(contributions, [16.67, 16.67, 16.67, 16.67, 16.66, 16.66]))
+    contributors = make_contributors(contributions, weights)
+    track_table = build_track_table({key: {"tracks": value} for key, value in contributions.items()})
+
+    for limit in (1, 50, 500):
+        assert build_indexed_blend_preview(
+            track_table, contributors, limit=limit, engine="numpy"
+        ) == build_indexed_blend_preview(track_table, contributors, limit=limit, engine="python")
+
+
+def test_numpy_engine_is_only_used_when_asked_for(monkeypatch):
+    monkeypatch.delenv("SATO_BLEND_ENGINE", raising=False)
+
+    assert resolve_blend_engine(build_config()["BLEND_ENGINE"]) == "python"
+    assert resolve_blend_engine("auto") == "python"
+    monkeypatch.setattr(blend_service, "np", None)
+    assert resolve_blend_engine("numpy") == "python"
+
+
+def test_contribution_snapshot_counts_each_source_in_one_pass():
+    def raw(prefix, count, shared=()):
+        tracks = [
+            {"id": f"{prefix}-{index}", "name": f"{prefix} {index}", "artists": [{"name": prefix}]}
+            for index in range(count)
+        ]
+        tracks.extend({"id": track_id, "name": track_id, "artists": []} for track_id in shared)
+        return [{"track": track} for track in tracks]
+
+    shared = [f"s{n}" for n in range(300)]
+    sources = {
+        "top_tracks": raw("top", 50, shared[:20]),
+        "saved_tracks": raw("saved", 500, shared),
+        "recent_tracks": raw("recent", 50, shared[:10]) + [{"track": {"id": "local", "is_local": True}}],
+        "playlist_tracks": raw("list-a", 500, shared) + raw("list-b", 500, shared),
+        "mood_tracks": raw("mood", 40, shared[:5]),
+    }
+
+    snapshot = build_contribution_snapshot(
+        use_top_tracks=True,
+        use_saved_tracks=True,
+        use_recent_tracks=True,
+        playlist_ids=["list-a", "list-b"],
+        selected_playlists=[{"id": "list-a"}, {"id": "list-b"}],
+        use_mood_tracks=True,
+        mood_state="happy",
+        **sources,
+    )
+
+    combined = [track for tracks in sources.values() for track in tracks]
+    assert snapshot["tracks"] == normalize_track_snapshot(combined)
+    assert snapshot["source_summary"] == {
+        "top_tracks_count": 70,
+        "saved_tracks_count": 800,
+        "recent_tracks_count": 60,
+        "playlist_count": 2,
+        "playlist_track_count": 1300,
+        "mood_tracks_count": 45,
+    }
+
+
+def test_cached_playlist_rows_keep_their_cover_art_when_renormalized():
+    cached_rows = normalize_track_snapshot(
+        [
+            {
+                "track": {
+                    "id": "instrumental",
+                    "name": "Instrumental",
+                    "artists": [],
+                    "album": {"images": [{"url": "https://images.test/instrumental.png"}]},
+                }
+            }
+        ]
+    )
+    assert cached_rows[0]["image"] == "https://images.test/instrumental.png"
+
+    snapshot = build_contribution_snapshot(
+        use_top_tracks=False,
+        use_saved_tracks=False,
+        use_recent_tracks=False,
+        playlist_ids=["list"],
+        selected_playlists=[{"id": "list"}],
+        top_tracks=[],
+        saved_tracks=[],
+        recent_tracks=[],
+        playlist_tracks=cached_rows,
+    )
+
+    assert snapshot["tracks"] == cached_rows
+
+
+def test_source_result_cache_hits_build_the_same_snapshot_as_misses():
+    raw_saved = [
+        {
+            "track": {
+                "id": track_id,
+                "name": track_id.title(),
+                "artists": artists,
+                "album": {"images": [{"url": f"https://images.test/{track_id}.png"}]},
+            }
+        }
+        for track_id, artists in (("solo", [{"name": "Ana"}]), ("ambient", []))
+    ]
+    cache = SourceResultCache(cachelib=SimpleCache())
+
+    def snapshot(saved_tracks):
+        return build_contribution_snapshot(
+            use_top_tracks=False,
+            use_saved_tracks=True,
+            use_recent_tracks=False,
+            playlist_ids=[],
+            selected_playlists=[],
+            top_tracks=[],
+            saved_tracks=saved_tracks,
+            recent_tracks=[],
+            playlist_tracks=[],
+        )
+
+    miss = snapshot(cache.set("user", "saved", normalize_track_snapshot(raw_saved)))
+    hit = snapshot(cache.get("user", "saved"))
+
+    assert hit == miss == snapshot(raw_saved)
+    assert {track["id"]: track["image"] for track in hit["tracks"]} == {
+        "solo": "https://images.test/solo.png",
+        "ambient": "https://images.test/ambient.png",
+    }
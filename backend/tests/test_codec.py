@@ -0,0 +1,41 @@
+import zlib
+
+from cachelib import SimpleCache
+from flask import Flask, jsonify
+
+from codec import ZLIB_PREFIX, FastJSONProvider, decode_blob, dumps, encode_blob
+from room_store import RoomStore
+
+
+def test_blobs_compress_only_above_the_threshold():
+    small = encode_blob({"ids": ["a"]}, compression="zlib", threshold=1024)
+    large_value = {"ids": [f"track-{index}" for index in range(500)]}
+    large = encode_blob(large_value, compression="zlib", threshold=1024)
+
+    assert small == dumps({"ids": ["a"]})
+    assert large.startswith(ZLIB_PREFIX)
+    assert zlib.decompress(large[len(ZLIB_PREFIX):]) == dumps(large_value)
+    assert decode_blob(small) == {"ids": ["a"]}
+    assert decode_blob(large) == large_value
+    assert decode_blob('{"legacy": true}') == {"legacy": True}
+
+
+def test_room_store_reads_back_compressed_track_tables():
+    store = RoomStore(cachelib=SimpleCache(), compression="zstd", compression_threshold=0)
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+
+    loaded = store.get_room(room["token"], include_tracks=True)
+
+    assert isinstance(store.cachelib.get(store._tracks_key(room["token"])), bytes)
+    assert loaded["track_table"] == room["track_table"]
+
+
+def test_json_provider_keeps_flask_response_shape():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    with app.app_context():
+        response = jsonify({"b": 1, "a": [1.5, "é"]})
+
+    assert response.mimetype == "application/json"
+    assert response.get_data(as_text=True) == '{"a":[1.5,"é"],"b":1}\n'
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fetch_pool import SourceFetcher
+from spotify_client import SpotifyAPIError
+
+
+def test_results_keep_task_order_even_when_later_tasks_finish_first():
+    fetcher = SourceFetcher(max_workers=3)
+
+    def slow():
+        time.sleep(0.05)
+        return "slow"
+
+    results = fetcher.run([slow, lambda: "fast", lambda: "faster"], user_id="host")
+
+    assert results == ["slow", "fast", "faster"]
+
+
+def test_per_user_concurrency_limit_is_respected():
+    fetcher = SourceFetcher(max_workers=2)
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def task():
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return True
+
+    assert fetcher.run([task] * 6, user_id="host") == [True] * 6
+    assert active["peak"] <= 2
+
+
+def test_first_spotify_error_cancels_pending_tasks():
+    fetcher = SourceFetcher(max_workers=2)
+    started = []
+
+    def failing():
+        started.append("failing")
+        raise SpotifyAPIError("Spotify request failed.", status_code=500)
+
+    def slow():
+        started.append("slow")
+        time.sleep(0.1)
+        return "slow"
+
+    def never():
+        started.append("never")
+        return "never"
+
+    with pytest.raises(SpotifyAPIError):
+        fetcher.run([failing, slow, never, never], user_id="host")
+
+    assert started.count("never") == 0
+
+
+def test_async_run_mixes_coroutines_and_sync_tasks_and_fails_fast():
+    fetcher = SourceFetcher(max_workers=2)
+    started = []
+
+    async def remote():
+        await asyncio.sleep(0.01)
+        return "remote"
+
+    async def failing():
+        started.append("failing")
+        raise SpotifyAPIError("Spotify request failed.", status_code=500)
+
+    async def never():
+        await asyncio.sleep(0.2)
+        started.append("never")
+
+    assert asyncio.run(fetcher.run_async([remote, lambda: "local"], user_id="host")) == ["remote", "local"]
+    with pytest.raises(SpotifyAPIError):
+        asyncio.run(fetcher.run_async([failing, never, never], user_id="host"))
+    assert "never" not in started
+
+
+def test_async_user_limit_holds_until_abandoned_threads_finish():
+    fetcher = SourceFetcher(max_workers=3)
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def spotify_call():
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.2)
+        with lock:
+            active["now"] -= 1
+        return True
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise SpotifyAPIError("Spotify request failed.", status_code=500)
+
+    async def main():
+        with pytest.raises(SpotifyAPIError):
+            await fetcher.run_async([spotify_call, spotify_call, failing], user_id="host")
+        # The failed request's threads are still calling Spotify here.
+        return await fetcher.run_async([spotify_call] * 3, user_id="host")
+
+    assert asyncio.run(main()) == [True] * 3
+    assert active["peak"] <= 3
+
+
+def test_nested_page_fan_out_runs_inline_on_page_threads():
+    outer = SourceFetcher(max_workers=2)
+    inner = SourceFetcher(max_workers=4)
+    threads = set()
+
+    def page():
+        threads.add(threading.current_thread().name)
+        return True
+
+    def playlist():
+        return inner.run([page] * 3)
+
+    assert outer.run([playlist, playlist]) == [[True] * 3, [True] * 3]
+    assert all(name.startswith("sato-pages") for name in threads)
@@ -0,0 +1,84 @@
+import queue
+import threading
+
+from room_events import (
+    RedisRoomEventBroker,
+    RoomEventBroker,
+    diff_serialized_room,
+    format_sse,
+)
+
+
+class FakePubSub:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def psubscribe(self, pattern):
+        # Redis answers asynchronously: the confirmation only shows up on listen().
+        self.redis_client.replies.put({"type": "psubscribe", "pattern": pattern, "data": 1})
+
+    def listen(self):
+        self.redis_client.confirmations.wait()
+        while True:
+            message = self.redis_client.replies.get()
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.replies = queue.Queue()
+        self.confirmations = threading.Event()
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    def publish(self, channel, data):
+        self.replies.put({"type": "pmessage", "channel": channel.encode(), "data": data})
+
+
+def test_subscriptions_coalesce_to_the_latest_event_and_time_out_quietly():
+    broker = RoomEventBroker()
+    subscription = broker.subscribe("room-1")
+    other_room = broker.subscribe("room-2")
+
+    broker.publish("room-1", {"version": 2})
+    broker.publish("room-1", {"version": 3})
+
+    assert subscription.wait(0.01) == {"version": 3}
+    assert subscription.wait(0.01) is None
+    assert other_room.wait(0.01) is None
+
+    subscription.close()
+    other_room.close()
+    assert broker.subscriber_count("room-1") == 0
+
+
+def test_room_diffs_only_carry_changed_fields():
+    previous = {"playlist_name": "Blend", "members": [{"id": "host"}], "has_wrapped": False}
+    current = {"playlist_name": "Road Trip", "members": [{"id": "host"}], "has_wrapped": False}
+
+    assert diff_serialized_room(previous, current) == {"playlist_name": "Road Trip"}
+    assert format_sse("room.diff", {"version": 2}) == 'event: room.diff\ndata: {"version":2}\n\n'
+
+
+def test_redis_subscribe_waits_for_the_pattern_subscription_to_be_confirmed():
+    redis_client = FakeRedis()
+    broker = RedisRoomEventBroker(redis_client)
+    subscriptions = []
+    subscriber = threading.Thread(target=lambda: subscriptions.append(broker.subscribe("room-1")))
+    subscriber.start()
+
+    subscriber.join(0.05)
+    assert subscriber.is_alive()
+
+    redis_client.confirmations.set()
+    subscriber.join(1)
+    broker.publish("room-1", {"version": 2})
+
+    assert subscriptions[0].wait(1) == {"version": 2}
+    redis_client.replies.put(None)
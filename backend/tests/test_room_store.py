@@ -0,0 +1,278 @@
+import threading
+import time
+
+import pytest
+from cachelib import FileSystemCache, SimpleCache
+
+from blend_service import add_to_track_table
+from room_store import ROOM_EXPIRY_INDEX_KEY, RoomConflictError, RoomDataLostError, RoomStore
+
+
+def make_store():
+    return RoomStore(cachelib=SimpleCache(threshold=100), ttl_seconds=60)
+
+
+def add_contribution(room, member_id, track_ids):
+    room["contributions"][member_id] = {
+        "track_count": len(track_ids),
+        "track_refs": add_to_track_table(
+            room["track_table"],
+            member_id,
+            [{"id": track_id, "name": track_id, "artists": [], "image": None} for track_id in track_ids],
+        ),
+    }
+
+
+def test_header_load_skips_track_data():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a", "b", "c"])
+    store.save_room(room)
+
+    header = store.get_room(room["token"])
+    assert "track_table" not in header
+    assert header["contributions"]["host"] == {"track_count": 3}
+
+    full_room = store.get_room(room["token"], include_tracks=True)
+    assert full_room["track_table"]["ids"] == ["a", "b", "c"]
+    assert full_room["contributions"]["host"]["track_refs"] == [0, 1, 2]
+
+
+def test_header_save_keeps_track_data_and_removed_refs_are_dropped():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a"])
+    add_contribution(room, "guest", ["b"])
+    store.save_room(room)
+
+    header = store.get_room(room["token"])
+    header["playlist_name"] = "Renamed"
+    store.save_room(header)
+
+    full_room = store.get_room(room["token"], include_tracks=True)
+    assert full_room["playlist_name"] == "Renamed"
+    assert full_room["contributions"]["guest"]["track_refs"] == [1]
+
+    full_room["contributions"].pop("guest")
+    store.save_room(full_room)
+    assert store.cachelib.get(store._refs_key(room["token"], "guest")) is None
+
+    store.delete_room(room["token"])
+    assert store.get_room(room["token"]) is None
+    assert store.cachelib.get(store._tracks_key(room["token"])) is None
+    assert store.cachelib.get(store._refs_key(room["token"], "host")) is None
+
+
+def test_header_save_renews_track_data_with_the_header():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a"])
+    store.save_room(room)
+    token = room["token"]
+    keys = [store._key(token), store._tracks_key(token), store._refs_key(token, "host")]
+    for key in keys:
+        store.cachelib.set(key, store.cachelib.get(key), timeout=1)
+
+    store.set_weights(store.get_room(token), {"host": 1})
+
+    expiries = [store.cachelib._cache[key][0] for key in keys]
+    assert min(expiries) > time.time() + 30
+
+
+def test_missing_track_data_fails_instead_of_dropping_members():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a"])
+    add_contribution(room, "guest", ["b"])
+    store.save_room(room)
+    token = room["token"]
+
+    store.cachelib.delete(store._refs_key(token, "guest"))
+    with pytest.raises(RoomDataLostError):
+        store.get_room(token, include_tracks=True)
+
+    store.cachelib.set(store._refs_key(token, "guest"), [1])
+    store.cachelib.delete(store._tracks_key(token))
+    with pytest.raises(RoomDataLostError):
+        store.get_room(token, include_tracks=True)
+    assert store.get_room(token)["contributions"]["guest"] == {"track_count": 1}
+
+
+def test_unpruned_room_cache_keeps_live_rooms_whole_past_the_file_threshold(tmp_path):
+    cache = FileSystemCache(str(tmp_path / "rooms"), threshold=0)
+    store = RoomStore(cachelib=cache, ttl_seconds=60, lock_dir=str(tmp_path / "locks"))
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a", "b"])
+    add_contribution(room, "guest", ["b", "c"])
+    store.save_room(room)
+
+    # Far more files than cachelib's default threshold of 500.
+    for index in range(200):
+        other = store.create_room(host_user_id=f"host-{index}", playlist_name="Other")
+        add_contribution(other, "host", [f"{index}-a"])
+        add_contribution(other, "guest", [f"{index}-b"])
+        store.save_room(other)
+        store.put_preview(other["token"], "key", {"tracks": []})
+    assert len(list(cache._list_dir())) > 1000
+
+    loaded = store.get_room(room["token"], include_tracks=True)
+    assert loaded["track_table"]["ids"] == ["a", "b", "c"]
+    assert loaded["contributions"]["guest"]["track_refs"] == [1, 2]
+
+
+def test_stale_writer_gets_a_conflict_instead_of_overwriting():
+    store = make_store()
+    token = store.create_room(host_user_id="host", playlist_name="Blend")["token"]
+    first = store.get_room(token)
+    second = store.get_room(token)
+
+    store.set_weights(first, {"host": 100})
+    second["playlist_name"] = "Lost update"
+    with pytest.raises(RoomConflictError):
+        store.save_header(second)
+
+    room = store.get_room(token)
+    assert room["weights"] == {"host": 100}
+    assert room["playlist_name"] == "Blend"
+    assert room["version"] == first["version"] == 2
+
+
+def test_workers_sharing_a_room_directory_do_not_lose_updates(tmp_path):
+    workers = [
+        RoomStore(
+            cachelib=FileSystemCache(str(tmp_path / "rooms")),
+            ttl_seconds=60,
+            lock_dir=str(tmp_path / "locks"),
+        )
+        for _ in range(2)
+    ]
+    room = workers[0].create_room(host_user_id="host", playlist_name="Blend")
+    token = room["token"]
+    names = []
+
+    def rename(store, name):
+        while True:
+            header = store.get_room(token)
+            header["playlist_name"] = name
+            try:
+                store.save_header(header)
+            except RoomConflictError:
+                continue
+            names.append(name)
+            return
+
+    threads = [
+        threading.Thread(target=rename, args=(workers[index % 2], f"Blend {index}"))
+        for index in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    header = workers[1].get_room(token)
+    assert header["version"] == 9
+    assert len(names) == 8 and header["playlist_name"] in names
+
+
+def test_put_contribution_only_rewrites_that_members_refs():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a"])
+    store.save_room(room)
+
+    room = store.get_room(room["token"], include_tracks=True)
+    store.cachelib.set(store._refs_key(room["token"], "host"), "untouched", timeout=0)
+    add_contribution(room, "guest", ["b"])
+    store.put_contribution(room, "guest")
+
+    assert store.cachelib.get(store._refs_key(room["token"], "host")) == "untouched"
+    assert store.cachelib.get(store._refs_key(room["token"], "guest")) == [1]
+
+
+def test_large_rooms_round_trip_through_repeated_saves():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    for index in range(6):
+        add_contribution(room, f"member-{index}", [f"{index}-{n}" for n in range(1000)])
+    store.save_room(room)
+
+    for _ in range(20):
+        room = store.get_room(room["token"], include_tracks=True)
+        store.save_room(room)
+
+    room = store.get_room(room["token"], include_tracks=True)
+    assert len(room["track_table"]["ids"]) == 6000
+    assert room["contributions"]["member-5"]["track_refs"][:2] == [5000, 5001]
+    assert room["version"] == 22
+
+
+def test_sweeper_removes_expired_rooms_and_keeps_renewed_ones():
+    cache = SimpleCache(threshold=100)
+    store = RoomStore(cachelib=cache, ttl_seconds=1)
+    expired = store.create_room(host_user_id="host", playlist_name="Old")
+    add_contribution(expired, "host", ["a"])
+    store.save_room(expired)
+    time.sleep(1.1)
+    live = RoomStore(cachelib=cache, ttl_seconds=60).create_room(host_user_id="host", playlist_name="New")
+
+    assert store.sweep_expired() == 1
+    assert cache.get(store._refs_key(expired["token"], "host")) is None
+    assert cache.get(store._tracks_key(expired["token"])) is None
+    assert store.sweep_expired(now=time.time() + 30) == 0
+    assert store.get_room(live["token"])["playlist_name"] == "New"
+
+
+def test_expiry_index_keeps_one_entry_per_room_and_expires_itself():
+    store = make_store()
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    index = store.expiry_index
+    first_expiry = index._heap[0][0]
+    time.sleep(0.01)
+    for _ in range(20):
+        store.save_header(room)
+
+    assert len(index._heap) == 1
+    assert index.pop_expired(first_expiry) == []
+    assert len(index._heap) == 1
+    assert [token for token, _ in index.pop_expired(time.time() + 61)] == [room["token"]]
+
+    index.sync()
+    assert store.cachelib._cache[ROOM_EXPIRY_INDEX_KEY][0] > time.time()
+
+
+def test_clear_only_removes_rooms():
+    cache = SimpleCache(threshold=100)
+    cache.set("sato:session:abc", {"user": "host"})
+    store = RoomStore(cachelib=cache, ttl_seconds=60)
+    token = store.create_room(host_user_id="host", playlist_name="Blend")["token"]
+
+    store.clear()
+
+    assert store.get_room(token) is None
+    assert cache.get("sato:session:abc") == {"user": "host"}
+
+
+def test_create_room_claims_tokens_without_reading_first(monkeypatch):
+    store = make_store()
+    tokens = iter(["taken", "taken", "fresh"])
+    monkeypatch.setattr("room_store.secrets.token_urlsafe", lambda _: next(tokens))
+    monkeypatch.setattr(store, "get_room", lambda *args, **kwargs: pytest.fail("create_room read the store"))
+
+    first = store.create_room(host_user_id="host", playlist_name="First")
+    second = store.create_room(host_user_id="guest", playlist_name="Second")
+
+    assert (first["token"], second["token"]) == ("taken", "fresh")
+    assert store.cachelib.get(store._key("taken"))["playlist_name"] == "First"
+
+
+def test_preview_slot_matches_its_key_and_goes_with_the_room():
+    store = make_store()
+    token = store.create_room(host_user_id="host", playlist_name="Blend")["token"]
+
+    store.put_preview(token, "inputs-1", {"tracks": ["a"]})
+
+    assert store.get_preview(token, "inputs-1") == {"tracks": ["a"]}
+    assert store.get_preview(token, "inputs-2") is None
+    store.delete_room(token)
+    assert store.cachelib.get(store._preview_key(token)) is None
@@ -2,13 +2,15 @@ import time
 
 import pytest
 
-from spotify_client import SpotifyAPIError, SpotifyClient
+from rate_limiter import RequestScheduler
+from spotify_client import ETagStore, SpotifyAPIError, SpotifyClient, build_http_session
 
 
 class FakeResponse:
-    def __init__(self, status_code, payload):
+    def __init__(self, status_code, payload, headers=None):
         self.status_code = status_code
         self.payload = payload
+        self.headers = headers or {}
         self.content = b"" if payload is None else b"payload"
 
     def json(self):
@@ -228,9 +230,261 @@ def test_add_tracks_to_playlist_batches_requests_in_chunks_of_one_hundred():
     track_uris = [f"spotify:track:{index}" for index in range(205)]
     payload = client.add_tracks_to_playlist("playlist-123", track_uris)
 
-    assert payload == {"snapshot_id": "snapshot"}
+    assert payload == {"snapshot_id": "third"}
     assert len(http_session.request_calls) == 3
     assert http_session.request_calls[0]["url"].endswith("/playlists/playlist-123/tracks")
     assert len(http_session.request_calls[0]["json"]["uris"]) == 100
     assert len(http_session.request_calls[1]["json"]["uris"]) == 100
     assert len(http_session.request_calls[2]["json"]["uris"]) == 5
+
+
+class RoutedHTTPSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.request_calls = []
+
+    def request(self, method, url, **kwargs):
+        self.request_calls.append({"method": method, "url": url, **kwargs})
+        return self.pages[url.replace(SpotifyClient.API_BASE, "", 1)]
+
+    def post(self, url, **kwargs):  # pragma: no cover - not used by these tests
+        raise AssertionError("Unexpected token request.")
+
+
+def saved_tracks_page(offset, size, total):
+    last_index = min(offset + size, total)
+    return FakeResponse(
+        200,
+        {
+            "items": [{"track": {"id": f"track-{index}"}} for index in range(offset, last_index)],
+            "limit": size,
+            "offset": offset,
+            "total": total,
+            "next": None if last_index >= total else f"next-{offset + size}",
+        },
+    )
+
+
+def test_parallel_pagination_fetches_offset_pages_in_order_and_trims_at_the_limit():
+    http_session = RoutedHTTPSession(
+        {
+            "/me/tracks?limit=50": saved_tracks_page(0, 50, 999),
+            "/me/tracks?limit=50&offset=50": saved_tracks_page(50, 50, 999),
+            "/me/tracks?limit=50&offset=100": saved_tracks_page(100, 50, 999),
+            "/me/tracks?limit=50&offset=150": saved_tracks_page(150, 50, 999),
+        }
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        page_fanout=3,
+    )
+
+    items = client.get_saved_tracks(limit=170)
+
+    assert [item["track"]["id"] for item in items] == [f"track-{index}" for index in range(170)]
+    assert len(http_session.request_calls) == 4
+
+
+def test_parallel_pagination_stops_at_the_reported_total():
+    http_session = RoutedHTTPSession(
+        {
+            "/me/tracks?limit=50": saved_tracks_page(0, 50, 60),
+            "/me/tracks?limit=50&offset=50": saved_tracks_page(50, 50, 60),
+        }
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        page_fanout=4,
+    )
+
+    items = client.get_saved_tracks(limit=500)
+
+    assert len(items) == 60
+    assert len(http_session.request_calls) == 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limited_requests_wait_for_retry_after_and_then_succeed():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep, jitter=lambda: 0.0)
+    http_session = FakeHTTPSession(
+        request_responses=[
+            FakeResponse(429, {"error": {"status": 429}}, headers={"Retry-After": "2"}),
+            FakeResponse(200, {"id": "me"}),
+        ],
+        token_responses=[],
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        scheduler=scheduler,
+    )
+
+    assert client.get_current_user() == {"id": "me"}
+    assert clock.sleeps == [2.0]
+    assert scheduler.stats() == {"throttled": 1, "retried": 1, "dropped": 0}
+
+
+def test_rate_limited_requests_are_dropped_after_the_retry_budget():
+    clock = FakeClock()
+    scheduler = RequestScheduler(
+        max_retries=1,
+        clock=clock,
+        sleep=clock.sleep,
+        jitter=lambda: 0.0,
+    )
+    http_session = FakeHTTPSession(
+        request_responses=[
+            FakeResponse(429, {"error": {"status": 429}}),
+            FakeResponse(429, {"error": {"status": 429}}),
+        ],
+        token_responses=[],
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        scheduler=scheduler,
+    )
+
+    with pytest.raises(SpotifyAPIError) as error:
+        client.get_current_user()
+
+    assert error.value.status_code == 429
+    assert scheduler.stats() == {"throttled": 2, "retried": 1, "dropped": 1}
+
+
+def test_scheduler_token_bucket_spaces_out_requests_beyond_the_burst():
+    clock = FakeClock()
+    scheduler = RequestScheduler(rate_per_second=2, burst=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        scheduler.acquire()
+
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_scheduler_only_waits_after_a_rate_limit_by_default():
+    clock = FakeClock()
+    scheduler = RequestScheduler(clock=clock, sleep=clock.sleep, jitter=lambda: 0.0)
+
+    for _ in range(100):
+        scheduler.acquire()
+    assert clock.sleeps == []
+
+    scheduler.backoff(0, retry_after=3)
+    scheduler.acquire()
+    assert clock.sleeps == [3.0]
+
+
+def test_conditional_requests_reuse_cached_payloads_on_not_modified():
+    http_session = FakeHTTPSession(
+        request_responses=[
+            FakeResponse(200, {"id": "me"}, headers={"ETag": '"v1"'}),
+            FakeResponse(304, None),
+        ],
+        token_responses=[],
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        etag_store=ETagStore(max_entries=2),
+    )
+
+    assert client.get_current_user() == {"id": "me"}
+    assert client.get_current_user() == {"id": "me"}
+    assert "If-None-Match" not in http_session.request_calls[0]["headers"]
+    assert http_session.request_calls[1]["headers"]["If-None-Match"] == '"v1"'
+
+
+def test_conditional_requests_hand_out_copies_of_cached_payloads():
+    http_session = FakeHTTPSession(
+        request_responses=[
+            FakeResponse(200, {"id": "me", "images": [{"url": "a.png"}]}, headers={"ETag": '"v1"'}),
+            FakeResponse(304, None),
+            FakeResponse(304, None),
+        ],
+        token_responses=[],
+    )
+
+    client = SpotifyClient(
+        client_id="client-id",
+        client_secret="client-secret",
+        redirect_uri="http://localhost:5000/api/auth/callback",
+        access_token="token",
+        refresh_token="refresh-token",
+        expires_at=time.time() + 3600,
+        http_session=http_session,
+        etag_store=ETagStore(max_entries=2),
+    )
+
+    client.get_current_user()["images"].clear()
+    not_modified = client.get_current_user()
+    not_modified["id"] = "changed"
+    not_modified["images"].append({"url": "b.png"})
+
+    assert client.get_current_user() == {"id": "me", "images": [{"url": "a.png"}]}
+
+
+def test_etag_store_evicts_least_recently_used_urls():
+    store = ETagStore(max_entries=2)
+    store.set("/a", "a", {"id": "a"})
+    store.set("/b", "b", {"id": "b"})
+    store.get("/a")
+    store.set("/c", "c", {"id": "c"})
+
+    assert store.get("/b") is None
+    assert store.get("/a") == ("a", {"id": "a"})
+
+
+def test_shared_http_session_pools_connections_and_keeps_no_cookies():
+    http_session = build_http_session(pool_size=7, connect_retries=1)
+    adapter = http_session.get_adapter(f"{SpotifyClient.API_BASE}/me")
+
+    assert adapter._pool_maxsize == 7
+    assert (adapter.max_retries.connect, adapter.max_retries.read) == (1, 0)
+    assert not http_session.cookies.get_policy().allowed_domains()
+    assert "Authorization" not in http_session.headers
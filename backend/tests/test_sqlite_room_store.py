@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from blend_service import add_to_track_table
+from room_store import RoomConflictError
+from sqlite_room_store import SqliteRoomStore
+
+
+def add_contribution(room, member_id, track_ids):
+    room["contributions"][member_id] = {
+        "track_count": len(track_ids),
+        "track_refs": add_to_track_table(
+            room["track_table"],
+            member_id,
+            [{"id": track_id, "name": track_id, "artists": [], "image": None} for track_id in track_ids],
+        ),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteRoomStore(tmp_path / "rooms.sqlite3", ttl_seconds=60)
+
+
+def test_rooms_round_trip_with_header_only_and_full_loads(store):
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a", "b"])
+    add_contribution(room, "guest", ["b", "c"])
+    store.save_room(room)
+
+    header = store.get_room(room["token"])
+    assert "track_table" not in header
+    assert header["contributions"]["guest"] == {"track_count": 2}
+
+    full_room = store.get_room(room["token"], include_tracks=True)
+    assert full_room["track_table"]["ids"] == ["a", "b", "c"]
+    assert full_room["contributions"]["guest"]["track_refs"] == [1, 2]
+
+    full_room["contributions"].pop("guest")
+    store.put_contribution(full_room, "guest")
+    assert "guest" not in store.get_room(room["token"], include_tracks=True)["contributions"]
+
+
+def test_stale_writes_conflict(store):
+    token = store.create_room(host_user_id="host", playlist_name="Blend")["token"]
+    first = store.get_room(token)
+    second = store.get_room(token)
+
+    store.set_weights(first, {"host": 100})
+    with pytest.raises(RoomConflictError):
+        store.save_header(second)
+    assert store.get_room(token)["version"] == 2
+
+
+def test_sweep_deletes_expired_rooms_and_their_contributions(store):
+    room = store.create_room(host_user_id="host", playlist_name="Blend")
+    add_contribution(room, "host", ["a"])
+    store.save_room(room)
+    store.put_preview(room["token"], "inputs", {"tracks": ["a"]})
+    assert store.get_preview(room["token"], "inputs") == {"tracks": ["a"]}
+
+    assert store.sweep_expired(now=time.time()) == 0
+    assert store.sweep_expired(now=time.time() + 120) == 1
+    assert store.get_room(room["token"]) is None
+    assert store._connection().execute("SELECT COUNT(*) FROM contributions").fetchone() == (0,)
+    assert store._connection().execute("SELECT COUNT(*) FROM previews").fetchone() == (0,)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import time
+
+from codec import dumps, loads
+
+
+PLAYLIST_TRACK_CACHE_SECONDS = 24 * 60 * 60
+PLAYLIST_TRACK_CACHE_MAX_ENTRIES = 256
+SOURCE_CATALOG_CACHE_SECONDS = 5 * 60
+SOURCE_CATALOG_CACHE_MAX_ENTRIES = 1000
+SOURCE_RESULT_MAX_AGE_SECONDS = 10 * 60
+SOURCE_RESULT_CACHE_MAX_ENTRIES = 4000
+
+
+class SharedCache:
+    namespace = None
+
+    def __init__(self, *, cachelib=None, redis_client=None, ttl_seconds, max_entries):
+        self.cachelib = cachelib
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def _key(self, *parts):
+        return ":".join(["sato", self.namespace, *(str(part) for part in parts)])
+
+    def _lru_key(self):
+        return f"sato:{self.namespace}:lru"
+
+    def _get(self, key):
+        if self.redis_client is not None:
+            raw_value = self.redis_client.get(key)
+            if raw_value is None:
+                self.redis_client.zrem(self._lru_key(), key)
+                return None
+            self.redis_client.zadd(self._lru_key(), {key: time.time()})
+            return loads(raw_value)
+
+        if self.cachelib is None:
+            return None
+
+        return self.cachelib.get(key)
+
+    def _set(self, key, value):
+        if self.redis_client is not None:
+            self.redis_client.setex(key, self.ttl_seconds, dumps(value))
+            self.redis_client.zadd(self._lru_key(), {key: time.time()})
+            overflow = self.redis_client.zcard(self._lru_key()) - self.max_entries
+            if overflow > 0:
+                evicted = [
+                    member for member, _ in self.redis_client.zpopmin(self._lru_key(), overflow)
+                ]
+                if evicted:
+                    self.redis_client.delete(*evicted)
+            return value
+
+        if self.cachelib is not None:
+            self.cachelib.set(key, value, timeout=self.ttl_seconds)
+
+        return value
+
+    def _delete(self, key):
+        if self.redis_client is not None:
+            self.redis_client.delete(key)
+            self.redis_client.zrem(self._lru_key(), key)
+        elif self.cachelib is not None:
+            self.cachelib.delete(key)
+
+    def clear(self):
+        if self.redis_client is not None:
+            keys = self.redis_client.zrange(self._lru_key(), 0, -1)
+            self.redis_client.delete(self._lru_key(), *keys)
+        elif self.cachelib is not None:
+            self.cachelib.clear()
+
+
+class PlaylistTrackCache(SharedCache):
+    namespace = "playlist-tracks"
+
+    def __init__(
+        self,
+        *,
+        cachelib=None,
+        redis_client=None,
+        ttl_seconds=PLAYLIST_TRACK_CACHE_SECONDS,
+        max_entries=PLAYLIST_TRACK_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(
+            cachelib=cachelib,
+            redis_client=redis_client,
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        )
+
+    def get(self, playlist_id, snapshot_id, limit):
+        if not playlist_id or not snapshot_id:
+            return None
+        return self._get(self._key(playlist_id, snapshot_id, limit))
+
+    def set(self, playlist_id, snapshot_id, limit, tracks):
+        if not playlist_id or not snapshot_id:
+            return tracks
+        return self._set(self._key(playlist_id, snapshot_id, limit), tracks)
+
+
+class SourceCatalogCache(SharedCache):
+    namespace = "source-catalog"
+
+    def __init__(
+        self,
+        *,
+        cachelib=None,
+        redis_client=None,
+        ttl_seconds=SOURCE_CATALOG_CACHE_SECONDS,
+        max_entries=SOURCE_CATALOG_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(
+            cachelib=cachelib,
+            redis_client=redis_client,
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        )
+
+    def get(self, user_id):
+        return self._get(self._key(user_id)) if user_id else None
+
+    def set(self, user_id, payload):
+        return self._set(self._key(user_id), payload) if user_id else payload
+
+    def delete(self, user_id):
+        if user_id:
+            self._delete(self._key(user_id))
+
+
+class SourceResultCache(SharedCache):
+    namespace = "source-results"
+
+    def __init__(
+        self,
+        *,
+        cachelib=None,
+        redis_client=None,
+        ttl_seconds=SOURCE_RESULT_MAX_AGE_SECONDS,
+        max_entries=SOURCE_RESULT_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(
+            cachelib=cachelib,
+            redis_client=redis_client,
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        )
+
+    def get(self, user_id, source_key):
+        entry = self._get(self._key(user_id, source_key))
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl_seconds:
+            return None
+        return entry["tracks"]
+
+    def set(self, user_id, source_key, tracks):
+        self._set(self._key(user_id, source_key), {"fetched_at": time.time(), "tracks": tracks})
+        return tracks
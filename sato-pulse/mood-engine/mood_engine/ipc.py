@@ -1,14 +1,64 @@
 import json
 import logging
+import math
 import signal
 import sys
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
 logger = logging.getLogger("mood_engine.ipc")
 
 PROTOCOL_VERSION = 1
 
 
+def _json_key(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (bool, int, float)):
+        return json.dumps(key, allow_nan=False)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _plain(value: Any) -> Any:
+    """Rewrite a message the way the stdlib encoder would read it, for orjson."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"Out of range float values are not JSON compliant: {value!r}")
+        return float(value)
+    if isinstance(value, dict):
+        return {_json_key(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return int(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(msg: dict) -> str:
+    """Encode one IPC line; both encoders reject NaN/Infinity and coerce keys alike."""
+    if orjson is not None:
+        return orjson.dumps(_plain(msg)).decode()
+    return json.dumps(msg, separators=(",", ":"), allow_nan=False)
+
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f"{name} is not valid JSON")
+
+
+def decode_message(line: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line, parse_constant=_reject_constant)
+
+
 class IPCHandler:
     """Handles JSON-over-stdin/stdout IPC with the Go process."""
 
@@ -21,8 +71,7 @@ class IPCHandler:
 
     def send(self, msg: dict) -> None:
         msg.setdefault("version", PROTOCOL_VERSION)
-        line = json.dumps(msg, separators=(",", ":"))
-        sys.stdout.write(line + "\n")
+        sys.stdout.write(encode_message(msg) + "\n")
         sys.stdout.flush()
 
     def send_error(self, request_id: str, error_type: str, message: str) -> None:
@@ -46,8 +95,8 @@ class IPCHandler:
                 continue
 
             try:
-                msg = json.loads(line)
-            except json.JSONDecodeError as e:
+                msg = decode_message(line)
+            except ValueError as e:
                 logger.error("invalid json: %s", e)
                 continue
 
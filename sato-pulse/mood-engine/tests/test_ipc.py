@@ -0,0 +1,62 @@
+"""Tests for IPC encoding parity between the orjson and stdlib json paths."""
+
+import json
+import math
+
+import pytest
+
+from mood_engine import ipc
+
+
+@pytest.fixture(params=["json", "orjson"])
+def codec(request, monkeypatch):
+    if request.param == "orjson":
+        monkeypatch.setattr(ipc, "orjson", pytest.importorskip("orjson"))
+    else:
+        monkeypatch.setattr(ipc, "orjson", None)
+    return request.param
+
+
+def test_messages_round_trip_with_keys_coerced_like_the_stdlib(codec):
+    msg = {
+        "type": "emotion_result",
+        "id": "req-1",
+        "emotions": {"happy": 0.75, 1: 0.25, 2.5: 0.0, True: 1, None: 0},
+        "tracks": ("a", "é"),
+        "face_detected": False,
+    }
+
+    line = ipc.encode_message(msg)
+
+    assert "\n" not in line
+    assert ipc.decode_message(line) == json.loads(json.dumps(msg))
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_are_rejected(codec, value):
+    with pytest.raises(ValueError):
+        ipc.encode_message({"type": "emotion_result", "mood_confidence": value})
+    with pytest.raises(ValueError):
+        ipc.encode_message({"type": "emotion_result", "emotions": {value: 1.0}})
+
+
+@pytest.mark.parametrize("value", [object(), {"a"}, b"bytes"])
+def test_values_the_stdlib_cannot_encode_are_rejected(codec, value):
+    with pytest.raises(TypeError):
+        ipc.encode_message({"type": "search_result", "tracks": [value]})
+    with pytest.raises(TypeError):
+        ipc.encode_message({"type": "search_result", "tracks": {(1, 2): value}})
+
+
+@pytest.mark.parametrize("line", ['{"mood_confidence": NaN}', '{"id": Infinity}', "{"])
+def test_invalid_json_lines_are_rejected(codec, line):
+    with pytest.raises(ValueError):
+        ipc.decode_message(line)
+
+
+def test_numpy_scores_encode_like_plain_floats(codec):
+    np = pytest.importorskip("numpy")
+
+    line = ipc.encode_message({"emotions": {"happy": np.float64(0.5)}})
+
+    assert ipc.decode_message(line) == {"emotions": {"happy": 0.5}}
@@ -86,19 +86,38 @@ run_step \
   "Python syntax check" \
   "$BACKEND_PYTHON" -m py_compile \
   "$BACKEND_DIR/app.py" \
+  "$BACKEND_DIR/benchmarks.py" \
   "$BACKEND_DIR/blend_service.py" \
+  "$BACKEND_DIR/codec.py" \
   "$BACKEND_DIR/spotify_client.py" \
+  "$BACKEND_DIR/room_events.py" \
   "$BACKEND_DIR/room_store.py" \
+  "$BACKEND_DIR/sqlite_room_store.py" \
   "$BACKEND_DIR/debug_tools.py" \
   "$BACKEND_DIR/e2e_support.py" \
+  "$BACKEND_DIR/fetch_pool.py" \
+  "$BACKEND_DIR/rate_limiter.py" \
+  "$BACKEND_DIR/track_cache.py" \
   "$BACKEND_DIR/tests/test_api.py" \
-  "$BACKEND_DIR/tests/test_spotify_client.py"
+  "$BACKEND_DIR/tests/test_blend_service.py" \
+  "$BACKEND_DIR/tests/test_codec.py" \
+  "$BACKEND_DIR/tests/test_fetch_pool.py" \
+  "$BACKEND_DIR/tests/test_room_events.py" \
+  "$BACKEND_DIR/tests/test_room_store.py" \
+  "$BACKEND_DIR/tests/test_spotify_client.py" \
+  "$BACKEND_DIR/tests/test_sqlite_room_store.py"
 
 run_step \
   "Backend test suite" \
   "$BACKEND_PYTHON" -m pytest \
   "$BACKEND_DIR/tests/test_api.py" \
-  "$BACKEND_DIR/tests/test_spotify_client.py"
+  "$BACKEND_DIR/tests/test_blend_service.py" \
+  "$BACKEND_DIR/tests/test_codec.py" \
+  "$BACKEND_DIR/tests/test_fetch_pool.py" \
+  "$BACKEND_DIR/tests/test_room_events.py" \
+  "$BACKEND_DIR/tests/test_room_store.py" \
+  "$BACKEND_DIR/tests/test_spotify_client.py" \
+  "$BACKEND_DIR/tests/test_sqlite_room_store.py"
 
 run_step \
   "Frontend unit tests" \